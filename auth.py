@@ -4,8 +4,10 @@ from jose import jwt, JWTError
 from config import settings_jwt
 from fastapi.security import OAuth2PasswordBearer
 from database import get_db
-from repository.user import RepoDep
+from repository.user import ReadRepoDep
 from models.user import UsersModel, UserRole
+from schemas.user import SPrincipal, SUserRead
+from pydantic import ValidationError
     
 def create_token(data: dict):
     to_encode = data.copy()
@@ -18,37 +20,47 @@ def create_token(data: dict):
     
     return jwt_token
 
+# Всё, что нужно для авторизации, кладём прямо в токен, чтобы не ходить за юзером в базу
+def create_user_token(user_id: int, user_name: str, role: UserRole | str):
+    return create_token(data={
+        'sub': user_name,
+        'uid': user_id,
+        'role': UserRole(role).value
+    })
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='users/login')
 
-async def get_current_user(repo: RepoDep, token: str = Depends(oauth2_scheme)):
-    
-    from service.user import UserReadService
-    
-    service = UserReadService(repo=repo)
-    
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> SPrincipal:
     try:
         payload = jwt.decode(token, settings_jwt.SECRET_KEY, algorithms=[settings_jwt.ALGORITHM])
-        
-        username = payload.get('sub')
-        
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail='Ошибка обработки токена. ID юзера не был получен!'
-            )
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Ошибка! Токен невалиден или истёк!'
         )
     
-    return await service.get_one_user(user_data=username)
+    try:
+        return SPrincipal(id=payload['uid'], name=payload['sub'], role=payload['role'])
+    except (KeyError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Ошибка обработки токена. ID юзера не был получен!'
+        )
+
+# Полная запись юзера из базы. Только для эндпоинтов, которым мало данных из токена.
+async def get_current_user(repo: ReadRepoDep, principal: SPrincipal = Depends(get_current_principal)) -> SUserRead:
+    
+    from service.user import UserReadService
+    
+    service = UserReadService(repo=repo)
+    
+    return await service.get_principal_user(user_id=principal.id)
 
 class RoleCheck:
     def __init__(self, allowed_roles: list[UserRole]):
         self.allowed_roles = allowed_roles
         
-    async def __call__(self, user = Depends(get_current_user)):
+    async def __call__(self, user: SPrincipal = Depends(get_current_principal)):
         if user.role not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -57,4 +69,4 @@ class RoleCheck:
         
         return user
     
-REFRESH_TOKEN_EXPIRE_DAYS = 30
\ No newline at end of file
+REFRESH_TOKEN_EXPIRE_DAYS = 30
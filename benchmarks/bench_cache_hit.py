@@ -0,0 +1,65 @@
+# Микробенчмарк: цена попадания в кеш cache_response для списка юзеров.
+# "до"    - json.loads + model_validate каждого элемента + валидация/сериализация ответа в FastAPI
+# "после" - готовые байты из Redis сразу в Response
+# Кеш в MemoryBackend, чтобы мерить только CPU, без сети.
+#
+# Запуск из корня проекта: python -m benchmarks.bench_cache_hit [юзеров] [итераций]
+
+import os
+os.environ.setdefault('JWT_SECRET_KEY', 'bench')
+
+import asyncio
+import json
+import sys
+import time
+from pydantic import TypeAdapter
+import utils
+from schemas.user import SUserRead
+from core.cache_backend import MemoryBackend
+
+def make_users(count: int) -> list[SUserRead]:
+    return [SUserRead(id=i, name=f'user{i}', age=30, city='Москва', role='user') for i in range(count)]
+
+async def bench(fn, iterations: int) -> float:
+    await fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    users = make_users(count)
+    backend = MemoryBackend()
+    utils.cache_backend = backend
+    
+    @utils.cache_response(expire=60, model=SUserRead)
+    async def get_all_users() -> list[SUserRead]:
+        return users
+    
+    await get_all_users()
+    legacy_json = json.dumps([user.model_dump() for user in users])
+    response_adapter = TypeAdapter(list[SUserRead])
+    
+    async def legacy_hit():
+        cache_data = json.loads(legacy_json)
+        result = [SUserRead.model_validate(item) for item in cache_data]
+        value = response_adapter.validate_python(result)
+        return json.dumps(response_adapter.dump_python(value, mode='json', by_alias=True)).encode()
+    
+    async def raw_hit():
+        return (await get_all_users()).body
+    
+    assert json.loads(await legacy_hit()) == json.loads(await raw_hit())
+    
+    before = await bench(legacy_hit, iterations)
+    after = await bench(raw_hit, iterations)
+    
+    print(f'юзеров в ответе: {count}, итераций: {iterations}')
+    print(f'до:    {before:10.1f} мкс на попадание')
+    print(f'после: {after:10.1f} мкс на попадание')
+    print(f'ускорение: x{before / after:.1f}')
+
+if __name__ == '__main__':
+    asyncio.run(main())
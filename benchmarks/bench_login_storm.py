@@ -0,0 +1,99 @@
+# Бенчмарк: пропускная способность логина и p99 "соседнего" эндпоинта во время шторма логинов.
+# Сравнивает bcrypt прямо в event loop (как было) с пулом потоков и пулом процессов.
+#
+# Запуск из корня проекта: python -m benchmarks.bench_login_storm [логинов] [параллельность]
+
+import os
+os.environ.setdefault('JWT_SECRET_KEY', 'bench')
+
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+import core.security as security
+
+PASSWORD = 'Bench12345'
+
+def build_app(mode: str, hashed: str) -> FastAPI:
+    app = FastAPI()
+    
+    @app.post('/login')
+    async def login():
+        if mode == 'inline':
+            ok = security.verify_password_sync(PASSWORD, hashed)
+        else:
+            ok = await security.verify_password(PASSWORD, hashed)
+        return {'ok': ok}
+    
+    @app.get('/ping')
+    async def ping():
+        return {'ok': True}
+    
+    return app
+
+async def run(mode: str, logins: int, concurrency: int, hashed: str) -> dict:
+    app = build_app(mode, hashed)
+    semaphore = asyncio.Semaphore(concurrency)
+    ping_latencies = []
+    storm_done = asyncio.Event()
+    
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://bench') as ac:
+        async def one_login():
+            async with semaphore:
+                await ac.post('/login')
+        
+        async def pinger():
+            while not storm_done.is_set():
+                start = time.perf_counter()
+                await ac.get('/ping')
+                ping_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+        
+        ping_task = asyncio.create_task(pinger())
+        start = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        storm_done.set()
+        await ping_task
+        
+    ping_latencies.sort()
+    p99 = ping_latencies[max(0, int(len(ping_latencies) * 0.99) - 1)]
+    
+    return {
+        'mode': mode,
+        'logins_per_sec': logins / elapsed,
+        'ping_count': len(ping_latencies),
+        'ping_p50_ms': statistics.median(ping_latencies) * 1000,
+        'ping_p99_ms': p99 * 1000,
+    }
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = os.cpu_count() or 1
+    hashed = security.hash_password_sync(PASSWORD)
+    
+    executors = {
+        'inline': None,
+        'thread': ThreadPoolExecutor(max_workers=workers),
+        'process': ProcessPoolExecutor(max_workers=workers),
+    }
+    
+    print(f'логинов: {logins}, параллельность: {concurrency}, ядер: {workers}')
+    print(f'{"режим":<10}{"логин/с":>12}{"ping n":>10}{"p50, мс":>12}{"p99, мс":>12}')
+    
+    for mode, executor in executors.items():
+        security._executor = executor
+        result = asyncio.run(run(mode, logins, concurrency, hashed))
+        print(f'{result["mode"]:<10}{result["logins_per_sec"]:>12.1f}{result["ping_count"]:>10}'
+              f'{result["ping_p50_ms"]:>12.2f}{result["ping_p99_ms"]:>12.2f}')
+        if executor is not None:
+            executor.shutdown()
+            
+    security._executor = None
+
+if __name__ == '__main__':
+    main()
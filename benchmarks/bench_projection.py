@@ -0,0 +1,87 @@
+# Бенчмарк: строк/с на чтении списков - ORM-сущности против проекций.
+# "orm"        - select(UsersModel) + joinedload(city_obj), identity map, SUserRead.model_validate
+#                через DisplayNameStr (и посты с selectinload(author) + SPostInfo.model_validate)
+# "projection" - UserRepository/PostRepository: только нужные колонки строками + from_row
+# Каждая итерация в новой сессии, чтобы identity map не отдавал объекты из прошлого прогона.
+#
+# Запуск из корня проекта: python -m benchmarks.bench_projection [строк] [итераций]
+# База - BENCH_DB_URL (по умолчанию sqlite в памяти)
+
+import os
+os.environ.setdefault('JWT_SECRET_KEY', 'bench')
+
+import asyncio
+import sys
+import time
+from sqlalchemy import select, insert, text
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database import Model
+from models.user import UsersModel, CityModel, PostModel
+from repository.user import UserRepository, PostRepository
+from schemas.user import SUserRead, SPostInfo
+
+TABLES = ('cities', 'skills', 'users', 'user_skills')
+
+async def prepare(engine, rows: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.drop_all, tables=[Model.metadata.tables['posts'], *(Model.metadata.tables[t] for t in reversed(TABLES))])
+        await conn.run_sync(Model.metadata.create_all, tables=[Model.metadata.tables[t] for t in TABLES])
+        # У posts составной ключ с автоинкрементом, в sqlite его create_all не строит
+        if engine.dialect.name == 'sqlite':
+            await conn.execute(text('CREATE TABLE posts (id INTEGER PRIMARY KEY, content VARCHAR NOT NULL, user_fk INTEGER NOT NULL REFERENCES users(id))'))
+        else:
+            await conn.run_sync(Model.metadata.create_all, tables=[Model.metadata.tables['posts']])
+
+        await conn.execute(insert(CityModel), [{'id': 1, 'city': 'Москва'}, {'id': 2, 'city': 'Сочи'}])
+        await conn.execute(insert(UsersModel), [
+            {'name': f'user{i}', 'age': 30, 'city_id': i % 2 + 1, 'password': '$2b$12$' + 'x' * 53, 'role': 'USER'}
+            for i in range(rows)
+        ])
+        await conn.execute(insert(PostModel), [{'content': f'пост {i}', 'user_fk': i % rows + 1} for i in range(rows)])
+
+async def users_orm(session) -> list:
+    result = await session.execute(select(UsersModel).options(joinedload(UsersModel.city_obj)).order_by(UsersModel.id))
+    return [SUserRead.model_validate(user) for user in result.scalars().unique().all()]
+
+async def users_projection(session) -> list:
+    return [SUserRead.from_row(row) for row in await UserRepository(session).get_all_users(limit=10 ** 9)]
+
+async def posts_orm(session) -> list:
+    result = await session.execute(select(PostModel).options(selectinload(PostModel.author)))
+    return [SPostInfo.model_validate(post) for post in result.scalars().all()]
+
+async def posts_projection(session) -> list:
+    return [SPostInfo.from_row(row) for row in await PostRepository(session).get_all_posts()]
+
+async def bench(maker, fn, iterations: int) -> float:
+    async with maker() as session:
+        rows = len(await fn(session))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        async with maker() as session:
+            await fn(session)
+    return rows * iterations / (time.perf_counter() - start)
+
+async def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    engine = create_async_engine(os.environ.get('BENCH_DB_URL', 'sqlite+aiosqlite:///:memory:'))
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    try:
+        await prepare(engine, rows)
+
+        print(f'строк: {rows}, итераций: {iterations}, база: {engine.dialect.name}')
+        print(f'{"запрос":<8}{"orm, строк/с":>16}{"проекция, строк/с":>20}{"ускорение":>12}')
+
+        for name, orm, projection in (('users', users_orm, users_projection), ('posts', posts_orm, posts_projection)):
+            before = await bench(maker, orm, iterations)
+            after = await bench(maker, projection, iterations)
+            print(f'{name:<8}{before:>16.0f}{after:>20.0f}{after / before:>11.1f}x')
+    finally:
+        await engine.dispose()
+
+if __name__ == '__main__':
+    asyncio.run(main())
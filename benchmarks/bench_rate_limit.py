@@ -0,0 +1,82 @@
+# Бенчмарк лимитера: точность и накладные расходы гибридного режима против чистого Redis.
+# Несколько "воркеров" (отдельные HybridLimiter со своей локальной квотой) долбят один ключ
+# в течение нескольких окон. Считаем, сколько запросов пропущено за окно, сколько было
+# походов в Redis и сколько стоит одна проверка.
+#
+# С живым Redis: REDIS_URL=redis://localhost:6379 python -m benchmarks.bench_rate_limit
+# Без REDIS_URL гоняется на MemoryBackend - точность та же, но "поход" бесплатный.
+
+import os
+os.environ.setdefault('JWT_SECRET_KEY', 'bench')
+
+import asyncio
+import secrets
+import time
+from redis import asyncio as aioredis
+import utils
+from core.cache_backend import MemoryBackend, RedisBackend
+from core.redis import redis_breaker
+
+LIMIT = 200
+PERIOD_MS = 1000
+WINDOWS = 3
+WORKERS = 4
+BATCH = 10
+RPS_PER_WORKER = 300
+
+class CountingBackend:
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+        
+    async def rate_limit(self, *args):
+        self.calls += 1
+        return await self.backend.rate_limit(*args)
+    
+    async def reserve(self, *args):
+        self.calls += 1
+        return await self.backend.reserve(*args)
+
+async def drive(check, worker_count: int) -> tuple[int, int, float]:
+    allowed = 0
+    checks = 0
+    spent = 0.0
+    deadline = time.monotonic() + WINDOWS * PERIOD_MS / 1000
+    
+    async def worker(index: int):
+        nonlocal allowed, checks, spent
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            result = await check(index)
+            spent += time.perf_counter() - start
+            checks += 1
+            allowed += result[0]
+            await asyncio.sleep(1 / RPS_PER_WORKER)
+            
+    await asyncio.gather(*(worker(i) for i in range(worker_count)))
+    return allowed, checks, spent / checks * 1_000_000
+
+async def main():
+    redis_url = os.environ.get('REDIS_URL')
+    redis = aioredis.Redis.from_url(redis_url) if redis_url else None
+    make_backend = lambda: RedisBackend(redis, redis, redis_breaker) if redis else MemoryBackend()
+    pure_backend = CountingBackend(make_backend())
+    hybrid_backend = CountingBackend(make_backend())
+    utils.cache_backend = hybrid_backend
+    
+    key = f'rate_limit:bench:{secrets.token_hex(4)}'
+    pure = await drive(lambda i: pure_backend.rate_limit('sliding_window', key + ':pure', LIMIT, PERIOD_MS, secrets.token_hex(4)), WORKERS)
+    
+    limiters = [utils.HybridLimiter(batch=BATCH) for _ in range(WORKERS)]
+    hybrid = await drive(lambda i: limiters[i].check(key + ':hybrid', LIMIT, PERIOD_MS), WORKERS)
+    
+    print(f'бэкенд {"redis" if redis else "memory"}, лимит {LIMIT} за {PERIOD_MS} мс, окон {WINDOWS}, воркеров {WORKERS}, пачка {BATCH}')
+    print(f'{"режим":<10}{"проверок":>10}{"пропущено/окно":>16}{"походов в бэкенд":>18}{"мкс/проверка":>14}')
+    for name, (allowed, checks, cost), calls in (('pure', pure, pure_backend.calls), ('hybrid', hybrid, hybrid_backend.calls)):
+        print(f'{name:<10}{checks:>10}{allowed / WINDOWS:>16.1f}{calls:>18}{cost:>14.1f}')
+        
+    if redis:
+        await redis.aclose()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field, AliasChoices
 from urllib.parse import quote_plus
+from typing import Literal
 
 class DataBase_Settings(BaseSettings):
     USER: str = 'postgres'
@@ -7,6 +9,22 @@ class DataBase_Settings(BaseSettings):
     DB: str = 'postgres'
     HOST: str = 'postgres-db'
     PORT: int = 5432
+    # Пул соединений на воркер: до POOL_SIZE + MAX_OVERFLOW соединений, дольше POOL_TIMEOUT
+    # секунд соединение не ждём. Размер подбираем по метрикам db.pool.* в GET /metrics
+    POOL_SIZE: int = 5
+    MAX_OVERFLOW: int = 10
+    POOL_TIMEOUT: float = 30
+    # Пересоздавать соединения старше POOL_RECYCLE секунд (-1 - никогда), проверять перед выдачей
+    POOL_RECYCLE: int = 30 * 60
+    POOL_PRE_PING: bool = True
+    # Кеш подготовленных запросов asyncpg на соединение. За pgbouncer в режиме transaction - 0
+    STATEMENT_CACHE_SIZE: int = 100
+    # Реплики для чтения, JSON-список URL: DB_REPLICA_URLS='["postgresql+asyncpg://...@replica-1/postgres"]'
+    REPLICA_URLS: list[str] = []
+    # На сколько секунд реплика с ошибкой соединения выпадает из круга
+    REPLICA_COOLDOWN: float = 5
+    # Сколько секунд после записи клиент читает с мастера
+    STICKY_WINDOW: float = 5
     
     @property
     def DATABASE_URL(self):
@@ -21,10 +39,80 @@ class JWT_Settings(BaseSettings):
     SECRET_KEY: str 
     EXPIRE_TIME: int = 30
     ALGORITHM: str = 'HS256'
+    # Refresh-сессии: sql - таблица refresh_tokens, redis - ключи с EXPIRE (Redis должен быть с AOF/RDB)
+    REFRESH_BACKEND: Literal['sql', 'redis'] = 'sql'
+    REFRESH_EXPIRE_DAYS: int = 30
+    # Чистка истёкших refresh-токенов в SQL: раз в SWEEP_INTERVAL секунд удаляем пачками по
+    # SWEEP_BATCH строк, между пачками SWEEP_PAUSE секунд, чтобы не держать долгих блокировок
+    SWEEP_INTERVAL: int = 60 * 60
+    SWEEP_BATCH: int = 1000
+    SWEEP_PAUSE: float = 0.1
 
     model_config = SettingsConfigDict(env_file='.env',
                                       env_prefix='JWT_',
                                       extra='ignore')
     
+class Hash_Settings(BaseSettings):
+    # process - пул процессов (bcrypt не держит event loop и не делит GIL), thread - пул потоков
+    EXECUTOR: Literal['process', 'thread'] = 'process'
+    # None - по количеству ядер
+    WORKERS: int | None = None
+    # Сколько юзеров (и хешей) принимает один запрос массовой регистрации
+    BULK_MAX_USERS: int = 5000
+
+    model_config = SettingsConfigDict(env_file='.env',
+                                      env_prefix='HASH_',
+                                      extra='ignore')
+    
+class Cache_Settings(BaseSettings):
+    # Кеш юзера для get_current_user: Redis + короткий локальный кеш в каждом воркере
+    PRINCIPAL_TTL: int = 300
+    PRINCIPAL_LOCAL_TTL: float = 5
+    PRINCIPAL_LOCAL_SIZE: int = 10_000
+    # Защита от штормов промахов в cache_response
+    SINGLE_FLIGHT: bool = True
+    LOCK_TTL_MS: int = 5000
+    LOCK_WAIT: float = 2.0
+    LOCK_POLL: float = 0.05
+    # Должен быть больше самого длинного expire в cache_response
+    ENTITY_GENERATION_TTL: int = 24 * 60 * 60
+    # L1 - локальный кеш воркера перед Redis для cache_response(l1=True)
+    L1_TTL: float = 5
+    L1_MAX_ENTRIES: int = 10_000
+    L1_MAX_BYTES: int = 32 * 1024 * 1024
+    INVALIDATION_CHANNEL: str = 'cache:invalidate'
+    # Где живут кеш, поколения, блокировки и счётчики лимитера: redis - общий для всех воркеров,
+    # memory - в памяти процесса (один воркер, тесты, бенчмарки)
+    BACKEND: Literal['redis', 'memory'] = 'redis'
+    MEMORY_MAX_KEYS: int = 100_000
+    # Сколько воркеров делят один счётчик лимитера: гибридный лимитер берёт за раз не больше
+    # limit // воркеры, чтобы один воркер не забрал всю квоту окна
+    RATE_LIMIT_WORKERS: int = Field(default=1, ge=1, validation_alias=AliasChoices('CACHE_RATE_LIMIT_WORKERS', 'WEB_CONCURRENCY'))
+    # Справочники городов и скиллов (repository.user.Cache)
+    DICTIONARY_REFRESH_INTERVAL: float = 300
+    DICTIONARY_MISS_RELOAD: float = 5
+    DICTIONARY_CHANNEL: str = 'dictionaries:reload'
+
+    model_config = SettingsConfigDict(env_file='.env',
+                                      env_prefix='CACHE_',
+                                      extra='ignore')
+    
+class Redis_Settings(BaseSettings):
+    URL: str = 'redis://redis-db:6379'
+    # Короткие таймауты: кеш и лимитер не должны ждать Redis дольше, чем сам запрос
+    SOCKET_TIMEOUT: float = 0.5
+    CONNECT_TIMEOUT: float = 0.5
+    # Circuit breaker: после стольких ошибок подряд перестаём ходить в Redis
+    BREAKER_FAILURES: int = 5
+    # Через сколько секунд пробуем PING, чтобы закрыть breaker
+    BREAKER_RESET: float = 5.0
+
+    model_config = SettingsConfigDict(env_file='.env',
+                                      env_prefix='REDIS_',
+                                      extra='ignore')
+    
 settings_db = DataBase_Settings()
 settings_jwt = JWT_Settings() #type: ignore
+settings_hash = Hash_Settings()
+settings_cache = Cache_Settings()
+settings_redis = Redis_Settings()
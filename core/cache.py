@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+import asyncio
+import time
+
+# In-process LRU с TTL. Живёт внутри одного воркера, без блокировок - всё в одном event loop.
+# max_bytes - дополнительный лимит по суммарному размеру значений (для байтовых тел ответов).
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float, max_bytes: int | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: OrderedDict[Any, tuple[float, Any, int]] = OrderedDict()
+        
+    def get(self, key: Any) -> Any:
+        item = self._data.get(key)
+        
+        if item is None:
+            return None
+        
+        expires_at, value, size = item
+        
+        if expires_at < time.monotonic():
+            self.pop(key)
+            return None
+        
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Any, value: Any, ttl: float | None = None):
+        size = len(value) if self.max_bytes is not None else 0
+        
+        self.pop(key)
+        
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value, size)
+        self.bytes += size
+        
+        while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+            
+    # Заменить значение живого ключа, не трогая его срок жизни. False - ключа нет или протух.
+    def update(self, key: Any, value: Any) -> bool:
+        item = self._data.get(key)
+        
+        if item is None or item[0] < time.monotonic():
+            return False
+        
+        size = len(value) if self.max_bytes is not None else 0
+        self._data[key] = (item[0], value, size)
+        self.bytes += size - item[2]
+        return True
+            
+    def pop(self, key: Any):
+        item = self._data.pop(key, None)
+        
+        if item is not None:
+            self.bytes -= item[2]
+            
+    def pop_where(self, predicate: Callable[[Any], bool]) -> int:
+        keys = [key for key in self._data if predicate(key)]
+        
+        for key in keys:
+            self.pop(key)
+            
+        return len(keys)
+        
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+        
+    def __len__(self):
+        return len(self._data)
+
+# Single-flight: пока для ключа идёт вычисление, остальные вызовы ждут его результат,
+# а не запускают то же самое параллельно. Вычисление идёт отдельной задачей, чтобы отмена
+# одного ожидающего не роняла результат для остальных.
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Any, asyncio.Task] = {}
+        
+    async def do(self, key: Any, factory: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        task = self._calls.get(key)
+        shared = task is not None
+        
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            
+        return await asyncio.shield(task), shared
+    
+    def _forget(self, key: Any, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            
+        # Помечаем исключение прочитанным, даже если дождаться было некому
+        if not task.cancelled():
+            task.exception()
+            
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,357 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from typing import AsyncIterator
+from redis import asyncio as aioredis
+import asyncio
+import math
+import time
+from config import settings_cache
+from core.cache import TTLCache
+from core.redis import raw_client, pubsub_client, redis_breaker, CircuitBreaker
+
+# Хранилище для cache_response, clean_cache, rate_limit и PrincipalCache.
+# redis - общий для всех воркеров, memory - в памяти процесса, для одного воркера, тестов и бенчмарков.
+# Все операции, которые в Redis делаются скриптом, здесь - один метод, чтобы реализация
+# могла выполнить их атомарно.
+
+RATE_LIMIT_ALGORITHMS = ('sliding_window', 'token_bucket')
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        return NotImplemented
+
+    # ttl в секундах, None - бессрочно. nx=True - записать только если ключа нет.
+    @abstractmethod
+    async def set(self, key: str, value: bytes | str, ttl: float | None = None, nx: bool = False) -> bool:
+        return NotImplemented
+
+    @abstractmethod
+    async def delete(self, key: str) -> int:
+        return NotImplemented
+
+    # Удалить ключ, только если в нём лежит value (снятие своей блокировки)
+    @abstractmethod
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        return NotImplemented
+
+    # ttl задан - срок жизни ставится заново, иначе остаётся прежним
+    @abstractmethod
+    async def incr(self, key: str, ttl: float | None = None) -> int:
+        return NotImplemented
+
+    # Склеить поколения из generation_keys через '.' и прочитать <prefix>:<поколение>:<args_hash>
+    @abstractmethod
+    async def lookup(self, generation_keys: list[str], prefix: str, args_hash: str) -> tuple[str, bytes | None]:
+        return NotImplemented
+
+    # INCR всех ключей (ключ -> ttl или None) и публикация message в channel одним походом
+    @abstractmethod
+    async def bump(self, keys: dict[str, float | None], channel: str, message: str):
+        return NotImplemented
+
+    @abstractmethod
+    def listen(self, channel: str) -> AsyncIterator[str | bytes]:
+        return NotImplemented
+
+    # {разрешено, осталось, retry_after_ms, reset_ms}
+    @abstractmethod
+    async def rate_limit(self, algorithm: str, key: str, limit: int, period_ms: int, member: str) -> tuple[int, int, int, int]:
+        return NotImplemented
+
+    # {выдано, мс до конца окна, осталось в окне после выдачи}
+    @abstractmethod
+    async def reserve(self, key: str, limit: int, period_ms: int, batch: int) -> tuple[int, int, int]:
+        return NotImplemented
+
+# Поколение и значение читаем за один поход в Redis
+LOOKUP_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+if KEYS[2] then
+    generation = generation .. '.' .. (redis.call('GET', KEYS[2]) or '0')
+end
+local key = ARGV[1] .. ':' .. generation .. ':' .. ARGV[2]
+return {key, redis.call('GET', key)}
+"""
+
+# Межпроцессная блокировка на пересчёт ключа. Снимаем только свою (сравниваем токен).
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Лимитер в Redis: проверка и списание - один EVALSHA, время берём у самого Redis,
+# у ключа всегда есть срок жизни.
+
+# Скользящее окно: в ZSET лежат отметки времени запросов за последние period мс
+SLIDING_WINDOW_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, now .. ':' .. ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], window)
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {1, limit - count - 1, 0, tonumber(oldest[2]) + window - now}
+end
+
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local retry_after = tonumber(oldest[2]) + window - now
+return {0, 0, retry_after, retry_after}
+"""
+
+# Token bucket: ёмкость limit, полностью наполняется за period мс
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local rate = capacity / period
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], period)
+return {allowed, math.floor(tokens), retry_after, math.ceil((capacity - tokens) / rate)}
+"""
+
+# Квота для гибридного лимитера: забрать из общего счётчика окна до batch штук
+RESERVE_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local grant = math.max(0, math.min(tonumber(ARGV[3]), limit - used))
+
+if grant > 0 then
+    redis.call('INCRBY', KEYS[1], grant)
+end
+
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], window)
+    ttl = window
+end
+
+return {grant, ttl, math.max(0, limit - used - grant)}
+"""
+
+# Каждая команда идёт через circuit breaker: пока он открыт, методы сразу падают с RedisUnavailable
+
+class RedisBackend(CacheBackend):
+    def __init__(self, redis: aioredis.Redis, pubsub: aioredis.Redis, breaker: CircuitBreaker):
+        self.redis = redis
+        self.pubsub = pubsub
+        self.breaker = breaker
+        self.lookup_script = redis.register_script(LOOKUP_SCRIPT)
+        self.release_lock_script = redis.register_script(RELEASE_LOCK_SCRIPT)
+        self.rate_limit_scripts = {
+            'sliding_window': redis.register_script(SLIDING_WINDOW_SCRIPT),
+            'token_bucket': redis.register_script(TOKEN_BUCKET_SCRIPT)
+        }
+        self.reserve_script = redis.register_script(RESERVE_SCRIPT)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.breaker.call(self.redis.get, key)
+
+    async def set(self, key: str, value: bytes | str, ttl: float | None = None, nx: bool = False) -> bool:
+        px = int(ttl * 1000) if ttl is not None else None
+        return bool(await self.breaker.call(self.redis.set, key, value, px=px, nx=nx))
+
+    async def delete(self, key: str) -> int:
+        return await self.breaker.call(self.redis.delete, key)
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        return bool(await self.breaker.call(self.release_lock_script, keys=[key], args=[value]))
+
+    async def incr(self, key: str, ttl: float | None = None) -> int:
+        if ttl is None:
+            return await self.breaker.call(self.redis.incr, key)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.pexpire(key, int(ttl * 1000))
+            value, _ = await self.breaker.call(pipe.execute)
+
+        return value
+
+    async def lookup(self, generation_keys: list[str], prefix: str, args_hash: str) -> tuple[str, bytes | None]:
+        key, value = await self.breaker.call(self.lookup_script, keys=generation_keys, args=[prefix, args_hash])
+        return key.decode(), value
+
+    async def bump(self, keys: dict[str, float | None], channel: str, message: str):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, ttl in keys.items():
+                pipe.incr(key)
+                if ttl is not None:
+                    pipe.pexpire(key, int(ttl * 1000))
+            pipe.publish(channel, message)
+            await self.breaker.call(pipe.execute)
+
+    async def listen(self, channel: str) -> AsyncIterator[str | bytes]:
+        async with self.pubsub.pubsub() as pubsub:
+            await pubsub.subscribe(channel)
+
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    yield message['data']
+
+    async def rate_limit(self, algorithm: str, key: str, limit: int, period_ms: int, member: str) -> tuple[int, int, int, int]:
+        allowed, remaining, retry_after_ms, reset_ms = await self.breaker.call(
+            self.rate_limit_scripts[algorithm],
+            keys=[key],
+            args=[limit, period_ms, member]
+        )
+        return allowed, remaining, retry_after_ms, reset_ms
+
+    async def reserve(self, key: str, limit: int, period_ms: int, batch: int) -> tuple[int, int, int]:
+        grant, ttl_ms, remaining = await self.breaker.call(self.reserve_script, keys=[key], args=[limit, period_ms, batch])
+        return grant, ttl_ms, remaining
+
+# Всё в TTLCache процесса: LRU по числу ключей, у каждого ключа свой срок жизни.
+# Методы не отдают управление event loop'у посередине, поэтому каждый из них атомарен,
+# как скрипт в Redis. Подписчики listen получают только то, что опубликовано в этом же процессе.
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_keys: int = settings_cache.MEMORY_MAX_KEYS):
+        self._data = TTLCache(maxsize=max_keys, ttl=math.inf)
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.monotonic() * 1000)
+
+    async def get(self, key: str) -> bytes | None:
+        value = self._data.get(key)
+
+        # Счётчики отдаём так же, как Redis
+        if isinstance(value, int):
+            return str(value).encode()
+        if isinstance(value, str):
+            return value.encode()
+        return value
+
+    async def set(self, key: str, value: bytes | str, ttl: float | None = None, nx: bool = False) -> bool:
+        if nx and self._data.get(key) is not None:
+            return False
+
+        self._data.set(key, value, ttl=ttl)
+        return True
+
+    async def delete(self, key: str) -> int:
+        if self._data.get(key) is None:
+            return 0
+
+        self._data.pop(key)
+        return 1
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        if self._data.get(key) != value:
+            return False
+
+        self._data.pop(key)
+        return True
+
+    async def incr(self, key: str, ttl: float | None = None) -> int:
+        value = int(self._data.get(key) or 0) + 1
+
+        if ttl is not None or not self._data.update(key, value):
+            self._data.set(key, value, ttl=ttl)
+
+        return value
+
+    async def lookup(self, generation_keys: list[str], prefix: str, args_hash: str) -> tuple[str, bytes | None]:
+        generation = '.'.join(str(self._data.get(key) or 0) for key in generation_keys)
+        key = f'{prefix}:{generation}:{args_hash}'
+        return key, await self.get(key)
+
+    async def bump(self, keys: dict[str, float | None], channel: str, message: str):
+        for key, ttl in keys.items():
+            await self.incr(key, ttl)
+
+        for queue in self._subscribers[channel]:
+            queue.put_nowait(message)
+
+    async def listen(self, channel: str) -> AsyncIterator[str | bytes]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[channel].add(queue)
+
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+
+    async def rate_limit(self, algorithm: str, key: str, limit: int, period_ms: int, member: str) -> tuple[int, int, int, int]:
+        if algorithm == 'sliding_window':
+            return self._sliding_window(key, limit, period_ms)
+        return self._token_bucket(key, limit, period_ms)
+
+    def _sliding_window(self, key: str, limit: int, window: int) -> tuple[int, int, int, int]:
+        now = self._now_ms()
+        hits: deque = self._data.get(key) or deque()
+
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+
+        if len(hits) < limit:
+            hits.append(now)
+            self._data.set(key, hits, ttl=window / 1000)
+            return 1, limit - len(hits), 0, hits[0] + window - now
+
+        retry_after = hits[0] + window - now
+        return 0, 0, retry_after, retry_after
+
+    def _token_bucket(self, key: str, capacity: int, period: int) -> tuple[int, int, int, int]:
+        now = self._now_ms()
+        rate = capacity / period
+        tokens, ts = self._data.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - ts) * rate)
+        allowed = 0
+        retry_after = 0
+
+        if tokens >= 1:
+            tokens -= 1
+            allowed = 1
+        else:
+            retry_after = math.ceil((1 - tokens) / rate)
+
+        self._data.set(key, (tokens, now), ttl=period / 1000)
+        return allowed, math.floor(tokens), retry_after, math.ceil((capacity - tokens) / rate)
+
+    async def reserve(self, key: str, limit: int, period_ms: int, batch: int) -> tuple[int, int, int]:
+        now = self._now_ms()
+        used, window_end = self._data.get(key) or (0, now + period_ms)
+
+        if window_end <= now:
+            used, window_end = 0, now + period_ms
+
+        grant = max(0, min(batch, limit - used))
+        self._data.set(key, (used + grant, window_end), ttl=(window_end - now) / 1000)
+
+        return grant, window_end - now, max(0, limit - used - grant)
+
+def create_cache_backend() -> CacheBackend:
+    if settings_cache.BACKEND == 'memory':
+        return MemoryBackend()
+    return RedisBackend(raw_client, pubsub_client, redis_breaker)
+
+cache_backend = create_cache_backend()
@@ -50,4 +50,10 @@ class SkillAlreadyInUser(BaseException):
     def __init__(self, skill_name: str):
         self.custom_detail = f'Скилл {skill_name} уже есть в списке скиллов пользователя!'
         super().__init__(detail=self.custom_detail)
-        
\ No newline at end of file
+        
+class InvalidCursorError(BaseException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    
+    def __init__(self):
+        self.custom_detail = 'Ошибка! Курсор пагинации невалиден!'
+        super().__init__(detail=self.custom_detail)
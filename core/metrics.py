@@ -0,0 +1,86 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable
+
+# Простые счётчики, гейджи и гистограммы процесса. Каждый воркер считает своё, отдаётся через GET /metrics.
+
+# Границы бакетов гистограмм, в миллисекундах
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = HISTOGRAM_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        
+    # Как в Prometheus: бакет le=N - сколько значений <= N, накопительно
+    def snapshot(self) -> dict:
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            buckets[str(bound)] = total
+        buckets['+Inf'] = self.count
+        
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': buckets
+        }
+
+class Metrics:
+    def __init__(self):
+        self._counters: dict[str, int] = defaultdict(int)
+        self._gauges: dict[str, float] = {}
+        self._histograms: dict[str, Histogram] = defaultdict(Histogram)
+        # Гейджи, которые считаются в момент снятия метрик
+        self._providers: dict[str, Callable[[], float]] = {}
+        
+    def inc(self, name: str, value: int = 1):
+        self._counters[name] += value
+        
+    def set(self, name: str, value: float):
+        self._gauges[name] = value
+        
+    def observe(self, name: str, value: float):
+        self._histograms[name].observe(value)
+        
+    def histogram(self, name: str) -> dict:
+        return self._histograms[name].snapshot()
+        
+    def register_gauge(self, name: str, provider: Callable[[], float]):
+        self._providers[name] = provider
+        
+    def ratio(self, hits: str, misses: str) -> float:
+        total = self.get(hits) + self.get(misses)
+        return self.get(hits) / total if total else 0.0
+        
+    def get(self, name: str) -> float:
+        if name in self._gauges:
+            return self._gauges[name]
+        return self._counters.get(name, 0)
+    
+    def snapshot(self) -> dict:
+        gauges = dict(self._gauges)
+        
+        for name, provider in self._providers.items():
+            gauges[name] = provider()
+            
+        return {
+            'counters': dict(self._counters),
+            'gauges': gauges,
+            'histograms': {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+        }
+        
+    def reset(self):
+        self._counters.clear()
+        self._gauges.clear()
+        self._histograms.clear()
+        
+metrics = Metrics()
@@ -1,13 +1,139 @@
 from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from fastapi import Depends
-from typing import Annotated, AsyncGenerator
+from typing import Annotated, Any, Awaitable, Callable
+import asyncio
+import time
+from config import settings_redis
+from core.metrics import metrics
 
-redis_pool = aioredis.ConnectionPool.from_url('redis://redis-db:6379', decode_responses=True)
+redis_pool = aioredis.ConnectionPool.from_url(
+    settings_redis.URL,
+    decode_responses=True,
+    socket_timeout=settings_redis.SOCKET_TIMEOUT,
+    socket_connect_timeout=settings_redis.CONNECT_TIMEOUT
+)
 client = aioredis.Redis(connection_pool=redis_pool)
 
+# Отдельный клиент без декодирования: кеш ответов хранит и отдаёт готовые байты тела
+raw_redis_pool = aioredis.ConnectionPool.from_url(
+    settings_redis.URL,
+    decode_responses=False,
+    socket_timeout=settings_redis.SOCKET_TIMEOUT,
+    socket_connect_timeout=settings_redis.CONNECT_TIMEOUT
+)
+raw_client = aioredis.Redis(connection_pool=raw_redis_pool)
+
+# Подписка ждёт сообщений сколько угодно, поэтому без таймаута на чтение
+pubsub_pool = aioredis.ConnectionPool.from_url(
+    settings_redis.URL,
+    decode_responses=True,
+    socket_connect_timeout=settings_redis.CONNECT_TIMEOUT
+)
+pubsub_client = aioredis.Redis(connection_pool=pubsub_pool)
+
 
 async def get_client(cls):
     yield client
 
 
 RedisDep = Annotated[aioredis.Redis, Depends(get_client)]
+
+# Circuit breaker вокруг Redis. После BREAKER_FAILURES ошибок подряд breaker открывается и
+# вызовы сразу падают с RedisUnavailable, не дожидаясь таймаутов. Через BREAKER_RESET секунд
+# breaker переходит в half-open: в фоне уходит PING, запросы всё ещё идут мимо Redis.
+# PING прошёл - breaker закрыт, нет - открыт ещё на BREAKER_RESET.
+# Ошибки самих команд (ResponseError и т.п.) Redis не роняют и breaker не трогают.
+
+REDIS_FAILURES = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+class RedisUnavailable(Exception):
+    pass
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    # Для метрики: гейдж должен быть числом
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, probe: Callable[[], Awaitable[Any]], failure_threshold: int, reset_timeout: float):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_task: asyncio.Task | None = None
+
+    @property
+    def state_code(self) -> int:
+        return self.STATE_CODES[self.state]
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_task = asyncio.create_task(self._run_probe())
+
+        return False
+
+    async def _run_probe(self):
+        try:
+            await self.probe()
+        except Exception as e:
+            print(f'REDIS: Проверка не прошла, breaker остаётся открытым: {e}')
+            self._open()
+        else:
+            print('REDIS: Redis снова доступен, breaker закрыт')
+            self.record_success()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        metrics.inc('redis.breaker.failures')
+
+        if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+            print(f'REDIS: {self.failures} ошибок подряд, breaker открыт на {self.reset_timeout}c.')
+            metrics.inc('redis.breaker.opened')
+            self._open()
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        if not self.allow():
+            metrics.inc('redis.breaker.rejected')
+            raise RedisUnavailable('Redis недоступен, breaker открыт')
+
+        try:
+            result = await func(*args, **kwargs)
+        except REDIS_FAILURES:
+            self.record_failure()
+            raise
+
+        self.record_success()
+        return result
+
+    def reset(self):
+        self.record_success()
+        self.opened_at = 0.0
+
+redis_breaker = CircuitBreaker(
+    probe=client.ping,
+    failure_threshold=settings_redis.BREAKER_FAILURES,
+    reset_timeout=settings_redis.BREAKER_RESET
+)
+
+metrics.register_gauge('redis.breaker.state', lambda: redis_breaker.state_code)
+
+# Пока breaker открыт, отказы ожидаемы - не пишем их в лог на каждый запрос
+def log_redis_error(action: str, e: Exception):
+    if not isinstance(e, RedisUnavailable):
+        print(f'Redis Error during {action}: {e}')
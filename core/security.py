@@ -1,9 +1,60 @@
 from passlib.context import CryptContext
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from config import settings_hash
+import asyncio
+import os
 
 pwd_context = CryptContext(schemes='bcrypt', deprecated='auto')
 
-def hash_password(password: str):
+# bcrypt считается ~200мс, поэтому никогда не зовём его прямо в event loop.
+# Пул создаётся лениво при первом хешировании и закрывается в lifespan.
+
+_executor: Executor | None = None
+
+def hash_workers() -> int:
+    return settings_hash.WORKERS or os.cpu_count() or 1
+
+def get_hash_executor() -> Executor:
+    global _executor
+    
+    if _executor is None:
+        workers = hash_workers()
+        
+        if settings_hash.EXECUTOR == 'thread':
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        else:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            
+    return _executor
+
+def shutdown_hash_executor():
+    global _executor
+    
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def hash_password_sync(password: str):
     return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+def verify_password_sync(plain_password: str, hashed_password: str):
+    return pwd_context.verify(plain_password, hashed_password)
+
+async def hash_password(password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), hash_password_sync, password)
+
+async def verify_password(plain_password: str, hashed_password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), verify_password_sync, plain_password, hashed_password)
+
+# Пачка паролей (массовая регистрация): считаем на всех ядрах сразу, но держим в пуле не больше
+# hash_workers() задач пачки, чтобы одиночные хеши (логин, регистрация) не ждали конца всего импорта.
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    semaphore = asyncio.Semaphore(hash_workers())
+    
+    async def hash_one(password: str) -> str:
+        async with semaphore:
+            return await hash_password(password)
+        
+    return list(await asyncio.gather(*(hash_one(password) for password in passwords)))
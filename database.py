@@ -1,17 +1,282 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, InterfaceError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from contextvars import ContextVar
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, Request
 from config import settings_db
+from core.metrics import metrics, Metrics
+import time
 
-engine = create_async_engine(settings_db.DATABASE_URL)
+# Пул, который меряет ожидание соединения: и ожидание свободного, и открытие нового в пределах overflow.
+# События пула (checkout, connect) приходят, когда соединение уже выдано, начала ожидания в них нет,
+# поэтому оборачиваем публичный Pool.connect() - через него движок берёт каждое соединение.
+# Имя гистограммы и реестр метрик задаёт instrument_engine
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    wait_metric: str | None = None
+    registry: Metrics = metrics
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            if self.wait_metric is not None:
+                self.registry.observe(self.wait_metric, (time.perf_counter() - start) * 1000)
+
+def engine_options(url: str) -> dict:
+    options = {
+        'poolclass': InstrumentedPool,
+        'pool_size': settings_db.POOL_SIZE,
+        'max_overflow': settings_db.MAX_OVERFLOW,
+        'pool_timeout': settings_db.POOL_TIMEOUT,
+        'pool_recycle': settings_db.POOL_RECYCLE,
+        'pool_pre_ping': settings_db.POOL_PRE_PING
+    }
+    
+    if url.startswith('postgresql+asyncpg'):
+        options['connect_args'] = {
+            'prepared_statement_cache_size': settings_db.STATEMENT_CACHE_SIZE,
+            'statement_cache_size': settings_db.STATEMENT_CACHE_SIZE
+        }
+        
+    return options
+
+engine = create_async_engine(settings_db.DATABASE_URL, **engine_options(settings_db.DATABASE_URL))
 new_session = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 class Model(MappedAsDataclass, DeclarativeBase):
     pass
 
+# Сессия создаётся при первом обращении к ней, соединение из пула - при первом запросе в базу.
+# Зависимости (give_repo, get_user_read_service и т.д.) собираются на каждый запрос ещё до
+# cache_response, а попадание в кеш до сессии так и не доходит - ничего не открываем и не закрываем.
+class LazySession:
+    def __init__(self, factory: async_sessionmaker = None):
+        self._factory = factory or new_session
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def _open(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+            metrics.inc('db.sessions_opened')
+        return self._session
+
+    def __getattr__(self, name: str):
+        return getattr(self._open(), name)
+
+    # Запись в запросе включает чтение с мастера для этого клиента (см. ReadYourWritesMiddleware)
+    async def commit(self):
+        await self._open().commit()
+        mark_write()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
 async def get_db():
-    async with new_session() as session:
+    session = LazySession()
+    try:
         yield session
+    finally:
+        await session.close()
+
+SessionDep = Annotated[AsyncSession, Depends(get_db)]
+
+# Реплики для чтения (DB_REPLICA_URLS). Читающие сервисы берут ReadSessionDep: сессия на
+# реплике по кругу, реплика с ошибкой соединения на REPLICA_COOLDOWN секунд выпадает из круга,
+# а запрос повторяется на мастере. Без реплик ReadSessionDep - та же сессия мастера.
+# Read-your-writes: после записи клиент STICKY_WINDOW секунд читает с мастера (кука STICKY_COOKIE),
+# чтобы не увидеть на отстающей реплике состояние до своей же записи.
+# Метрики: db.reads.replica / db.reads.primary / db.reads.sticky, db.reads.fallbacks, db.replica.failures.
+
+STICKY_COOKIE = 'read_primary_until'
+REPLICA_FAILURES = (OperationalError, InterfaceError, OSError)
+
+_request_wrote: ContextVar[list[bool] | None] = ContextVar('request_wrote', default=None)
+
+def mark_write():
+    wrote = _request_wrote.get()
+    if wrote is not None:
+        wrote[0] = True
+
+def request_wrote() -> bool:
+    wrote = _request_wrote.get()
+    return wrote is not None and wrote[0]
+
+class ReplicaRouter:
+    def __init__(self, factories: list[async_sessionmaker], cooldown: float):
+        self.factories = factories
+        self.cooldown = cooldown
+        self._next = 0
+        self._down_until = [0.0] * len(factories)
+
+    # Индекс следующей живой реплики или None - тогда читаем с мастера
+    def pick(self) -> int | None:
+        now = time.monotonic()
+
+        for _ in range(len(self.factories)):
+            index = self._next % len(self.factories)
+            self._next += 1
+            if self._down_until[index] <= now:
+                return index
+
+        return None
+
+    def mark_failed(self, index: int, e: Exception):
+        print(f'БАЗА: Реплика {index} недоступна, читаем с мастера {self.cooldown}c.: {e}')
+        metrics.inc('db.replica.failures')
+        self._down_until[index] = time.monotonic() + self.cooldown
+
+replica_engines = [create_async_engine(url, **engine_options(url)) for url in settings_db.REPLICA_URLS]
+replica_router = ReplicaRouter(
+    factories=[async_sessionmaker(bind=replica, expire_on_commit=False) for replica in replica_engines],
+    cooldown=settings_db.REPLICA_COOLDOWN
+)
+
+class ReadSession(LazySession):
+    def __init__(self, router: ReplicaRouter):
+        super().__init__()
+        self._router = router
+        self._replica: int | None = None
+
+    def _open(self) -> AsyncSession:
+        if self._session is None:
+            self._replica = self._router.pick()
+            if self._replica is None:
+                metrics.inc('db.reads.primary')
+            else:
+                self._factory = self._router.factories[self._replica]
+                metrics.inc('db.reads.replica')
+        return super()._open()
+
+    async def execute(self, *args, **kwargs):
+        try:
+            return await self._open().execute(*args, **kwargs)
+        except REPLICA_FAILURES as e:
+            if self._replica is None:
+                raise
+            self._router.mark_failed(self._replica, e)
+            metrics.inc('db.reads.fallbacks')
+
+        # Чтение повторить безопасно: закрываем сессию реплики и идём на мастер
+        await self._session.close()
+        self._session, self._replica, self._factory = None, None, new_session
+        return await super()._open().execute(*args, **kwargs)
+
+def _sticky(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def get_read_db(request: Request):
+    if not replica_router.factories:
+        session = LazySession()
+    elif _sticky(request) or request_wrote():
+        metrics.inc('db.reads.sticky')
+        session = LazySession()
+    else:
+        session = ReadSession(replica_router)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
+
+# Если запрос что-то закоммитил на мастере, к ответу добавляется кука STICKY_COOKIE
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not replica_router.factories:
+            return await self.app(scope, receive, send)
+
+        wrote = [False]
+        token = _request_wrote.set(wrote)
+
+        async def send_with_cookie(message):
+            if message['type'] == 'http.response.start' and wrote[0]:
+                window = settings_db.STICKY_WINDOW
+                cookie = f'{STICKY_COOKIE}={time.time() + window:.3f}; Max-Age={int(window) + 1}; Path=/; HttpOnly; SameSite=lax'
+                message = {**message, 'headers': [*message.get('headers', []), (b'set-cookie', cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_wrote.reset(token)
+
+# Выдачи соединений из пула: всего (db.checkouts) и на HTTP-запрос. Счётчик запроса лежит
+# в contextvar, его ставит DBCheckoutMiddleware; фоновые задачи считаются только в общем.
+#   db.requests / db.request_checkouts - запросов и выдач за них,
+#   db.requests_without_checkout       - запросов, обошедшихся без базы (например попадания в кеш),
+#   db.checkouts_per_request           - среднее.
+# Состояние пула, <prefix> = db.pool:
+#   <prefix>.size, .checked_out, .checked_in, .overflow - гейджи на момент снятия метрик,
+#   <prefix>.checkout_wait_ms  - гистограмма ожидания соединения,
+#   <prefix>.checkout_hold_ms  - гистограмма времени, на которое соединение забрали из пула.
+_request_checkouts: ContextVar[list[int] | None] = ContextVar('request_checkouts', default=None)
+
+# registry - куда писать метрики пула. Гейджи держат ссылку на пул, поэтому временным движкам
+# (тесты, скрипты) лучше отдавать свой Metrics(), а не глобальный реестр из /metrics
+def instrument_engine(async_engine: AsyncEngine, prefix: str = 'db.pool', registry: Metrics = metrics):
+    pool = async_engine.sync_engine.pool
+    
+    if isinstance(pool, InstrumentedPool):
+        pool.wait_metric = f'{prefix}.checkout_wait_ms'
+        pool.registry = registry
         
-SessionDep = Annotated[AsyncSession, Depends(get_db)]
\ No newline at end of file
+    if isinstance(pool, QueuePool):
+        registry.register_gauge(f'{prefix}.size', pool.size)
+        registry.register_gauge(f'{prefix}.checked_out', pool.checkedout)
+        registry.register_gauge(f'{prefix}.checked_in', pool.checkedin)
+        # QueuePool ведёт overflow от -pool_size, нам нужны только соединения сверх пула
+        registry.register_gauge(f'{prefix}.overflow', lambda: max(0, pool.overflow()))
+    
+    @event.listens_for(async_engine.sync_engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        registry.inc('db.checkouts')
+        counter = _request_checkouts.get()
+        if counter is not None:
+            counter[0] += 1
+            
+    @event.listens_for(async_engine.sync_engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        if checked_out_at is not None:
+            registry.observe(f'{prefix}.checkout_hold_ms', (time.perf_counter() - checked_out_at) * 1000)
+
+instrument_engine(engine)
+for index, replica in enumerate(replica_engines):
+    instrument_engine(replica, prefix=f'db.replica{index}.pool')
+
+metrics.register_gauge('db.checkouts_per_request', lambda: metrics.get('db.request_checkouts') / (metrics.get('db.requests') or 1))
+
+class DBCheckoutMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        counter = [0]
+        token = _request_checkouts.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_checkouts.reset(token)
+            metrics.inc('db.requests')
+            metrics.inc('db.request_checkouts', counter[0])
+            if counter[0] == 0:
+                metrics.inc('db.requests_without_checkout')
@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 from routers.user import router as UserRouter
-from database import engine, Model
+from routers.metrics import router as MetricsRouter
+from database import engine, Model, DBCheckoutMiddleware, ReadYourWritesMiddleware
 from contextlib import asynccontextmanager
 from repository.user import Cache
-from database import new_session
-from config import settings_db
+from config import settings_db, settings_jwt
+from core.security import shutdown_hash_executor
+from utils import listen_cache_invalidations
+from service.user import RefreshTokenSweeper
+import asyncio
 
 
 @asynccontextmanager
@@ -15,15 +19,30 @@ async def lifespan(app: FastAPI):
     print('База данных готова к работе!')
     
     try:
-        async with new_session() as session:
-            await Cache.update_cache(session=session)
+        await Cache.reload()
         print('Список городов в базе обновлён!')
     except Exception as e:
         print(f'КРИТИЧЕСКАЯ ОШИБКА! Список городов не был обновлён! {e}')
         
+    background_tasks = [
+        asyncio.create_task(listen_cache_invalidations()),
+        asyncio.create_task(Cache.refresh_periodically()),
+        asyncio.create_task(Cache.listen_reloads())
+    ]
+    # В Redis истёкшие сессии удаляет EXPIRE, чистить нечего
+    if settings_jwt.REFRESH_BACKEND == 'sql':
+        background_tasks.append(asyncio.create_task(RefreshTokenSweeper.run_periodically()))
+        
     yield 
     
+    for task in background_tasks:
+        task.cancel()
+    shutdown_hash_executor()
+    
     print('Выключение сервера!')
     
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(DBCheckoutMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 app.include_router(UserRouter)
+app.include_router(MetricsRouter)
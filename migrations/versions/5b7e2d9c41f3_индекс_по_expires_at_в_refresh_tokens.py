@@ -0,0 +1,32 @@
+"""индекс по expires_at в refresh_tokens
+
+Revision ID: 5b7e2d9c41f3
+Revises: 8a8287e855e0
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2d9c41f3'
+down_revision: Union[str, Sequence[str], None] = '8a8287e855e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица уже может быть раздутой: строим индекс CONCURRENTLY, без блокировки записи.
+    # CONCURRENTLY нельзя внутри транзакции, поэтому autocommit_block
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens', postgresql_concurrently=True)
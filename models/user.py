@@ -71,5 +71,5 @@ class RefreshSessionModel(Model):
     id: Mapped[int] = mapped_column(primary_key=True, init= False)
     refresh_token: Mapped[str] = mapped_column(String, index=True, unique=True, nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), init = False)
\ No newline at end of file
@@ -1,18 +1,41 @@
-from sqlalchemy import select, delete
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select, delete, insert, literal, func, DateTime, Row
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
 from abc import ABC, abstractmethod
-from database import AsyncSession
+from database import AsyncSession, new_session
 from models.user import UsersModel, CityModel, SkillsModel, user_skills, PostModel, RefreshSessionModel
 from fastapi import Depends
 from typing import Annotated
-from database import SessionDep
-from typing import List
-from core.exceptions import UserNotFoundError
-from datetime import datetime
+from database import SessionDep, ReadSessionDep
+from typing import List, AsyncIterator
+from datetime import datetime, timezone
+from redis import asyncio as aioredis
+from core.redis import client, redis_breaker
+from core.cache import SingleFlight
+from core.cache_backend import cache_backend
+from core.metrics import metrics
+from config import settings_cache, settings_jwt
+import hashlib
+import asyncio
+import time
+
+# Сколько строк драйвер отдаёт за раз при потоковой выгрузке
+EXPORT_YIELD_PER = 1000
+# Строк в одном INSERT при массовой регистрации: держимся подальше от лимита параметров драйвера
+INSERT_BATCH_SIZE = 1000
+
+# Справочники городов и скиллов в памяти воркера: name -> id, поиск O(1).
+# Обновляются целиком (новые словари подменяют старые одним присваиванием, без await между ними):
+# - раз в DICTIONARY_REFRESH_INTERVAL секунд,
+# - по сообщению в канал DICTIONARY_CHANNEL (например PUBLISH dictionaries:reload 1 после правки справочников в базе),
+# - на промахе: перед отказом перечитываем базу один раз на всех ждущих, но не чаще DICTIONARY_MISS_RELOAD секунд.
 
 class Cache:
     _cities: dict[str, int] = {}
     _skills: dict[str, int] = {}
+    _reload_attempted_at: float = float('-inf')
+    _reloads = SingleFlight()
     
     @classmethod
     def get_city_id(cls, cities_name: str) -> int:
@@ -27,6 +50,18 @@ class Cache:
             return cls._skills[skills_name]
         else:
             raise ValueError('Скилл не зарегистрирован!')
+        
+    @classmethod
+    async def resolve_city_id(cls, cities_name: str) -> int:
+        if cities_name not in cls._cities:
+            await cls.reload_on_miss()
+        return cls.get_city_id(cities_name)
+    
+    @classmethod
+    async def resolve_skill_id(cls, skills_name: str) -> int:
+        if skills_name not in cls._skills:
+            await cls.reload_on_miss()
+        return cls.get_skill_id(skills_name)
     
     @classmethod   
     async def update_cache(cls, session: AsyncSession):
@@ -36,12 +71,65 @@ class Cache:
         result_skills = await session.execute(query2)
         data_cities = result_cities.all()
         data_skills = result_skills.all()
-        cls._cities = {city: id for id, city in data_cities}
-        cls._skills = {name: id for id, name in data_skills}
+        cls._cities, cls._skills = {city: id for id, city in data_cities}, {name: id for id, name in data_skills}
+        
+    @classmethod
+    async def _reload(cls):
+        cls._reload_attempted_at = time.monotonic()
+        
+        async with new_session() as session:
+            await cls.update_cache(session=session)
+            
+        metrics.inc('dictionaries.reloads')
+        
+    @classmethod
+    async def reload(cls):
+        await cls._reloads.do('dictionaries', cls._reload)
+        
+    @classmethod
+    async def reload_on_miss(cls):
+        if time.monotonic() - cls._reload_attempted_at < settings_cache.DICTIONARY_MISS_RELOAD:
+            return
+        
+        metrics.inc('dictionaries.miss_reloads')
+        
+        try:
+            await cls.reload()
+        except Exception as e:
+            print(f'СПРАВОЧНИКИ: Ошибка обновления: {e}')
+            
+    @classmethod
+    async def refresh_periodically(cls):
+        while True:
+            await asyncio.sleep(settings_cache.DICTIONARY_REFRESH_INTERVAL)
+            
+            try:
+                await cls.reload()
+            except Exception as e:
+                print(f'СПРАВОЧНИКИ: Ошибка обновления: {e}')
+                
+    @classmethod
+    async def listen_reloads(cls):
+        while True:
+            try:
+                async for _ in cache_backend.listen(settings_cache.DICTIONARY_CHANNEL):
+                    await cls.reload()
+                    print('СПРАВОЧНИКИ: Обновлены по сообщению из канала')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'СПРАВОЧНИКИ: Подписка на обновления потеряна: {e}')
+                await asyncio.sleep(1)
+        
+# INSERT с ON CONFLICT есть только в диалектных insert, берём тот, что у текущей базы
+def dialect_insert(session: AsyncSession, table):
+    if session.get_bind().dialect.name == 'sqlite':
+        return sqlite_insert(table)
+    return postgresql_insert(table)
         
 class BaseUserRepository(ABC):
     @abstractmethod
-    async def create_user(self, user: UsersModel, session: AsyncSession):
+    async def create_user(self, user: dict) -> int:
         return NotImplemented
     
 class UserRepository(BaseUserRepository):  
@@ -49,36 +137,87 @@ class UserRepository(BaseUserRepository):
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def create_user(self, user: UsersModel) -> UsersModel:
+    # Запись - один INSERT ... RETURNING id. Ответ сервис собирает сам из того, что уже знает,
+    # город берётся из Cache, поэтому ни refresh, ни join с cities не нужны.
+    async def create_user(self, user: dict) -> int:
+        query = insert(UsersModel).values(**user).returning(UsersModel.id)
         
-        self.session.add(user)
+        result = await self.session.execute(query)
+        user_id = result.scalar_one()
         
         await self.session.commit()
         
-        await self.session.refresh(user, attribute_names=['city_obj'])
+        return user_id
+    
+    # Массовая вставка: многострочный INSERT пачками по INSERT_BATCH_SIZE, один commit на всё.
+    # Занятые имена не роняют пачку - такие строки просто не вернутся из RETURNING.
+    async def create_users(self, rows: list[dict]) -> list[tuple[int, str]]:
+        created = []
+        
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            query = (
+                dialect_insert(self.session, UsersModel.__table__)
+                .values(rows[start:start + INSERT_BATCH_SIZE])
+                .on_conflict_do_nothing(index_elements=[UsersModel.name])
+                .returning(UsersModel.id, UsersModel.name)
+            )
+            result = await self.session.execute(query)
+            created.extend((row.id, row.name) for row in result)
+            
+        await self.session.commit()
         
-        return user
+        return created
     
-    async def get_all_users(self) -> List[UsersModel]:
-        query = select(UsersModel).options(joinedload(UsersModel.city_obj))
+    async def get_existing_names(self, names: list[str]) -> set[str]:
+        if not names:
+            return set()
+        
+        query = select(UsersModel.name).where(UsersModel.name.in_(names))
         
         result = await self.session.execute(query)
         
-        return list(result.scalars().unique().all())
+        return set(result.scalars().all())
     
-    async def get_one_user(self, user_id: int) -> UsersModel | None:
-        query = select(UsersModel).options(joinedload(UsersModel.city_obj)).where(UsersModel.id == user_id)
+    # Чтение юзеров - только нужные колонки плоскими строками (id, name, age, role, city):
+    # без пароля, без identity map и без сборки CityModel. В схему их переводит SUserRead.from_row
+    @staticmethod
+    def _user_rows():
+        return (
+            select(UsersModel.id, UsersModel.name, UsersModel.age, UsersModel.role, CityModel.city)
+            .join(CityModel, UsersModel.city_id == CityModel.id)
+        )
+    
+    async def get_all_users(self, limit: int, after_id: int | None = None) -> List[Row]:
+        query = self._user_rows().order_by(UsersModel.id).limit(limit)
+        
+        if after_id is not None:
+            query = query.where(UsersModel.id > after_id)
         
         result = await self.session.execute(query)
         
-        return result.scalar_one_or_none()
+        return list(result.all())
     
-    async def get_user_by_name(self, user_name: str) -> UsersModel | None:
-        query = select(UsersModel).options(joinedload(UsersModel.city_obj)).where(UsersModel.name == user_name)
+    async def get_one_user(self, user_id: int) -> Row | None:
+        query = self._user_rows().where(UsersModel.id == user_id)
+        
+        result = await self.session.execute(query)
+        
+        return result.one_or_none()
+    
+    async def get_user_by_name(self, user_name: str) -> Row | None:
+        query = self._user_rows().where(UsersModel.name == user_name)
 
         result = await self.session.execute(query)
         
-        return result.scalar_one_or_none()
+        return result.one_or_none()
+    
+    # Для логина: id, name, role и хеш пароля, город не нужен
+    async def get_user_credentials(self, user_name: str) -> Row | None:
+        query = select(UsersModel.id, UsersModel.name, UsersModel.role, UsersModel.password).where(UsersModel.name == user_name)
+        
+        result = await self.session.execute(query)
+        
+        return result.one_or_none()
     
     async def get_user_skills(self, user_id: int) -> UsersModel | None:
         query = select(UsersModel).options(selectinload(UsersModel.skills_list)).where(UsersModel.id == user_id)
@@ -96,64 +235,188 @@ class UserRepository(BaseUserRepository):
 
         return
     
-    async def add_skill_at_user(self, user_id: int, skill_name: str) -> UsersModel:
-        query = select(UsersModel).options(selectinload(UsersModel.skills_list)).where(UsersModel.id == user_id)
-        user = await self.session.execute(query)
-        user = user.scalar_one_or_none()
-        
-        if not user:
-            raise UserNotFoundError()
-            
-        query2 = select(SkillsModel).where(SkillsModel.name == skill_name)
-        skill = await self.session.execute(query2)
-        skill = skill.scalar_one()
-        
-        user.skills_list.append(skill)
+    async def stream_users_export(self) -> AsyncIterator[dict]:
+        query = (
+            select(UsersModel.id, UsersModel.name, UsersModel.age, UsersModel.role, CityModel.city, SkillsModel.name.label('skill'))
+            .join(CityModel, UsersModel.city_id == CityModel.id)
+            .outerjoin(user_skills, user_skills.c.user_id == UsersModel.id)
+            .outerjoin(SkillsModel, SkillsModel.id == user_skills.c.skill_id)
+            .order_by(UsersModel.id)
+            .execution_options(yield_per=EXPORT_YIELD_PER)
+        )
+        
+        result = await self.session.stream(query)
+        
+        # Строки отсортированы по id, поэтому скиллы одного юзера идут подряд
+        current = None
+        async for row in result:
+            if current is None or current['id'] != row.id:
+                if current is not None:
+                    yield current
+                current = {
+                    'id': row.id,
+                    'name': row.name,
+                    'age': row.age,
+                    'role': row.role.value,
+                    'city': row.city,
+                    'skills': []
+                }
+            if row.skill is not None:
+                current['skills'].append(row.skill)
+                
+        if current is not None:
+            yield current
+    
+    # Связи пишем прямо в user_skills по id: многострочный INSERT пачками по INSERT_BATCH_SIZE
+    # (у asyncpg не больше 32767 параметров на запрос), один commit на всё. Дубликаты пропускаются,
+    # возвращаются только реально добавленные пары.
+    async def add_skills(self, pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        if not pairs:
+            return []
+        
+        added = []
+        
+        for start in range(0, len(pairs), INSERT_BATCH_SIZE):
+            query = (
+                dialect_insert(self.session, user_skills)
+                .values([{'user_id': user_id, 'skill_id': skill_id} for user_id, skill_id in pairs[start:start + INSERT_BATCH_SIZE]])
+                .on_conflict_do_nothing()
+                .returning(user_skills.c.user_id, user_skills.c.skill_id)
+            )
+            result = await self.session.execute(query)
+            added.extend((row.user_id, row.skill_id) for row in result)
         
         await self.session.commit()
         
-        await self.session.refresh(user)
-        
-        return user
+        return added
     
 class PostRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
         
-    async def add_post(self, user_id: int, post: PostModel) -> PostModel: 
-        self.session.add(post)
+    # Пост и имя автора одним запросом: INSERT ... RETURNING в CTE и join с users.
+    # Существование автора проверяет внешний ключ (IntegrityError), а не отдельный SELECT.
+    async def add_post(self, user_id: int, content: str):
+        new_post = (
+            insert(PostModel)
+            .values(content=content, user_fk=user_id)
+            .returning(PostModel.id, PostModel.content, PostModel.user_fk)
+            .cte('new_post')
+        )
+        query = (
+            select(new_post.c.id, new_post.c.content, UsersModel.id.label('author_id'), UsersModel.name.label('author_name'))
+            .join(UsersModel, UsersModel.id == new_post.c.user_fk)
+        )
         
-        await self.session.commit()
+        result = await self.session.execute(query)
+        post = result.one()
         
-        await self.session.refresh(post)
+        await self.session.commit()
         
         return post
     
-    async def get_all_posts(self) -> List[PostModel]:
-        query = select(PostModel).options(selectinload(PostModel.author))
+    # Пост и автор плоскими строками, как в add_post: content, author_id, author_name
+    async def get_all_posts(self) -> List[Row]:
+        query = (
+            select(PostModel.content, UsersModel.id.label('author_id'), UsersModel.name.label('author_name'))
+            .join(UsersModel, PostModel.user_fk == UsersModel.id)
+        )
         
         result = await self.session.execute(query)
         
-        return list(result.scalars().all())
+        return list(result.all())
+    
+    async def stream_posts_export(self) -> AsyncIterator[dict]:
+        query = (
+            select(PostModel.id, PostModel.content, UsersModel.id.label('author_id'), UsersModel.name.label('author_name'))
+            .join(UsersModel, PostModel.user_fk == UsersModel.id)
+            .order_by(PostModel.id)
+            .execution_options(yield_per=EXPORT_YIELD_PER)
+        )
+        
+        result = await self.session.stream(query)
+        
+        async for row in result:
+            yield dict(row._mapping)
+    
+class BaseRefreshRepository(ABC):
+    @abstractmethod
+    async def create_token(self, token: RefreshSessionModel) -> RefreshSessionModel:
+        return NotImplemented
+    
+    # Возвращает id, name и role юзера или None, если старого токена нет или он истёк
+    @abstractmethod
+    async def rotate_token(self, old_token: str, new_token: RefreshSessionModel):
+        return NotImplemented
+    
+    @abstractmethod
+    async def delete_token(self, token: str):
+        return NotImplemented
     
-class RefreshRepository:
+    # Выход на всех устройствах, возвращает число удалённых сессий
+    @abstractmethod
+    async def delete_user_tokens(self, user_id: int) -> int:
+        return NotImplemented
+
+class RefreshRepository(BaseRefreshRepository):
     def __init__(self, session: AsyncSession):
         self.session = session
         
+    # Все поля токена известны заранее, поэтому просто INSERT без refresh
     async def create_token(self, token: RefreshSessionModel) -> RefreshSessionModel:
-        self.session.add(token)
+        query = insert(RefreshSessionModel).values(
+            refresh_token=token.refresh_token,
+            user_id=token.user_id,
+            expires_at=token.expires_at
+        )
         
-        await self.session.commit()
+        await self.session.execute(query)
         
-        await self.session.refresh(token)
+        await self.session.commit()
         
         return token
     
-    async def get_token(self, token: str) -> RefreshSessionModel | None:
-        query = select(RefreshSessionModel).where(RefreshSessionModel.refresh_token == token)
+    # Ротация одним запросом: DELETE старого (только если не истёк) -> INSERT нового для того же
+    # юзера -> данные юзера для access-токена. Старого нет или он истёк - ничего не вставится и вернётся None.
+    async def rotate_token(self, old_token: str, new_token: RefreshSessionModel):
+        deleted = (
+            delete(RefreshSessionModel)
+            .where(RefreshSessionModel.refresh_token == old_token, RefreshSessionModel.expires_at > func.now())
+            .returning(RefreshSessionModel.user_id)
+            .cte('old_token')
+        )
+        inserted = (
+            insert(RefreshSessionModel)
+            .from_select(
+                ['refresh_token', 'user_id', 'expires_at'],
+                select(
+                    literal(new_token.refresh_token),
+                    deleted.c.user_id,
+                    literal(new_token.expires_at, DateTime(timezone=True))
+                )
+            )
+            .returning(RefreshSessionModel.user_id)
+            .cte('new_token')
+        )
+        query = select(UsersModel.id, UsersModel.name, UsersModel.role).join(inserted, UsersModel.id == inserted.c.user_id)
+        
         result = await self.session.execute(query)
+        user = result.one_or_none()
         
-        return result.scalar_one_or_none()
+        await self.session.commit()
+        
+        return user
+    
+    # Сессия вместе с именем и ролью юзера - всё, что нужно для claims нового access-токена
+    async def get_token(self, token: str):
+        query = (
+            select(RefreshSessionModel.user_id, RefreshSessionModel.expires_at, UsersModel.name, UsersModel.role)
+            .join(UsersModel, UsersModel.id == RefreshSessionModel.user_id)
+            .where(RefreshSessionModel.refresh_token == token)
+        )
+        result = await self.session.execute(query)
+        
+        return result.one_or_none()
     
     async def delete_token(self, token: str):
         query = delete(RefreshSessionModel).where(RefreshSessionModel.refresh_token == token)
@@ -164,17 +427,188 @@ class RefreshRepository:
         
         return
     
+    async def delete_user_tokens(self, user_id: int) -> int:
+        query = delete(RefreshSessionModel).where(RefreshSessionModel.user_id == user_id)
+        
+        result = await self.session.execute(query)
+        
+        await self.session.commit()
+        
+        return result.rowcount
+    
+    # Одна пачка для чистки: DELETE ... WHERE id IN (SELECT id ... LIMIT n) по индексу expires_at.
+    # SKIP LOCKED - строки, занятые ротацией или другим воркером, пропускаем, а не ждём
+    async def delete_expired(self, now: datetime, limit: int) -> int:
+        expired = (
+            select(RefreshSessionModel.id)
+            .where(RefreshSessionModel.expires_at <= now)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        query = delete(RefreshSessionModel).where(RefreshSessionModel.id.in_(expired.scalar_subquery()))
+        
+        result = await self.session.execute(query)
+        
+        await self.session.commit()
+        
+        return result.rowcount
+    
+# Refresh-сессии в Redis: refresh:<sha256 токена> -> user_id с EXPIRE на срок жизни токена,
+# истёкшие сессии Redis удаляет сам. Сам токен не хранится, только хеш.
+# refresh_user:<user_id> - множество хешей сессий юзера для выхода на всех устройствах.
+# Все изменения - Lua-скрипты, поэтому ротация атомарна так же, как в SQL-версии.
+# Каждый ключ, который трогает скрипт, передаётся в KEYS: user_id заранее читаем обычным GET,
+# а скрипт проверяет, что токен всё ещё принадлежит этому юзеру - иначе его уже ротировали или удалили.
+
+ROTATE_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[4] then
+    return false
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], ARGV[4], 'EX', ARGV[3])
+redis.call('SREM', KEYS[3], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[2])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return ARGV[4]
+"""
+
+DELETE_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS[1] - множество сессий юзера, KEYS[2..] - ключи его токенов, ARGV - их хеши.
+# Из множества убираем только переданные хеши: сессия, созданная между SMEMBERS и скриптом, остаётся
+DELETE_USER_REFRESH_SCRIPT = """
+local deleted = 0
+for i = 2, #KEYS do
+    deleted = deleted + redis.call('DEL', KEYS[i])
+    redis.call('SREM', KEYS[1], ARGV[i - 1])
+end
+return deleted
+"""
+
+class RedisRefreshRepository(BaseRefreshRepository):
+    TOKEN_PREFIX = 'refresh:'
+    USER_PREFIX = 'refresh_user:'
+    # Скрипты регистрируются один раз на класс (это только подсчёт sha), выполняются на self.redis
+    rotate_script = client.register_script(ROTATE_REFRESH_SCRIPT)
+    delete_script = client.register_script(DELETE_REFRESH_SCRIPT)
+    delete_user_script = client.register_script(DELETE_USER_REFRESH_SCRIPT)
+    
+    def __init__(self, session: AsyncSession, redis: aioredis.Redis = client):
+        self.session = session
+        self.redis = redis
+        
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    @staticmethod
+    def _ttl(token: RefreshSessionModel) -> int:
+        return max(1, int((token.expires_at - datetime.now(timezone.utc)).total_seconds()))
+    
+    async def _owner(self, token_hash: str) -> str | None:
+        return await redis_breaker.call(self.redis.get, f'{self.TOKEN_PREFIX}{token_hash}')
+    
+    async def _delete(self, token_hash: str, user_id: str) -> int:
+        return await redis_breaker.call(
+            self.delete_script,
+            keys=[f'{self.TOKEN_PREFIX}{token_hash}', f'{self.USER_PREFIX}{user_id}'],
+            args=[token_hash, user_id],
+            client=self.redis
+        )
+    
+    async def create_token(self, token: RefreshSessionModel) -> RefreshSessionModel:
+        token_hash = self._hash(token.refresh_token)
+        sessions_key = f'{self.USER_PREFIX}{token.user_id}'
+        ttl = self._ttl(token)
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(f'{self.TOKEN_PREFIX}{token_hash}', token.user_id, ex=ttl)
+            pipe.sadd(sessions_key, token_hash)
+            pipe.expire(sessions_key, ttl)
+            await redis_breaker.call(pipe.execute)
+            
+        return token
+    
+    async def rotate_token(self, old_token: str, new_token: RefreshSessionModel):
+        old_hash = self._hash(old_token)
+        new_hash = self._hash(new_token.refresh_token)
+        user_id = await self._owner(old_hash)
+        
+        if user_id is None:
+            return None
+        
+        rotated = await redis_breaker.call(
+            self.rotate_script,
+            keys=[f'{self.TOKEN_PREFIX}{old_hash}', f'{self.TOKEN_PREFIX}{new_hash}', f'{self.USER_PREFIX}{user_id}'],
+            args=[old_hash, new_hash, self._ttl(new_token), user_id],
+            client=self.redis
+        )
+        
+        if rotated is None:
+            return None
+        
+        # Юзера могли удалить, а его сессии в Redis живут до своего EXPIRE
+        query = select(UsersModel.id, UsersModel.name, UsersModel.role).where(UsersModel.id == int(user_id))
+        result = await self.session.execute(query)
+        user = result.one_or_none()
+        
+        if user is None:
+            await self._delete(new_hash, user_id)
+        
+        return user
+    
+    async def delete_token(self, token: str):
+        token_hash = self._hash(token)
+        user_id = await self._owner(token_hash)
+        
+        if user_id is not None:
+            await self._delete(token_hash, user_id)
+        
+        return
+    
+    async def delete_user_tokens(self, user_id: int) -> int:
+        sessions_key = f'{self.USER_PREFIX}{user_id}'
+        hashes = list(await redis_breaker.call(self.redis.smembers, sessions_key))
+        
+        if not hashes:
+            return 0
+        
+        return await redis_breaker.call(
+            self.delete_user_script,
+            keys=[sessions_key, *(f'{self.TOKEN_PREFIX}{token_hash}' for token_hash in hashes)],
+            args=hashes,
+            client=self.redis
+        )
+    
 async def give_repo(session: SessionDep):
     return UserRepository(session)
 
 async def give_post_repo(session: SessionDep):
     return PostRepository(session=session)
 
-async def give_refresh_repo(session: SessionDep):
+# Только чтение: сессия на реплике, если они настроены
+async def give_read_repo(session: ReadSessionDep):
+    return UserRepository(session)
+
+async def give_read_post_repo(session: ReadSessionDep):
+    return PostRepository(session=session)
+
+async def give_refresh_repo(session: SessionDep) -> BaseRefreshRepository:
+    if settings_jwt.REFRESH_BACKEND == 'redis':
+        return RedisRefreshRepository(session=session)
     return RefreshRepository(session=session)
 
 
 RepoDep = Annotated[UserRepository, Depends(give_repo)]
 RepoPostDep = Annotated[PostRepository, Depends(give_post_repo)]
-RepoRefreshDep = Annotated[RefreshRepository, Depends(give_refresh_repo)]
+ReadRepoDep = Annotated[UserRepository, Depends(give_read_repo)]
+ReadRepoPostDep = Annotated[PostRepository, Depends(give_read_post_repo)]
+RepoRefreshDep = Annotated[BaseRefreshRepository, Depends(give_refresh_repo)]
         
\ No newline at end of file
@@ -0,0 +1,8 @@
+from fastapi import APIRouter, status
+from core.metrics import metrics
+
+router = APIRouter(prefix='/metrics')
+
+@router.get('', status_code=status.HTTP_200_OK)
+async def get_metrics() -> dict:
+    return metrics.snapshot()
@@ -1,18 +1,22 @@
-from fastapi import APIRouter, status, Request, Depends, Response, Cookie, HTTPException
+from fastapi import APIRouter, status, Request, Depends, Response, Cookie, HTTPException, Query
 from fastapi.security import OAuth2PasswordRequestForm
-from service.user import ServiceUserRead, ServiceUserReg, ServiceUserRedaction, ServicePost, ServiceToken
-from typing import List
-from schemas.user import SUserAdd, SUserRead, SUserSKillsRead, SUserAddSkill, SPostInfo, SPostAdd, STokenResponse
+from fastapi.responses import StreamingResponse
+from service.user import ServiceUserRead, ServiceUserReg, ServiceUserRedaction, ServicePost, ServicePostRead, ServiceToken, ServiceExport
+from schemas.user import SUserAdd, SUserRead, SUserSKillsRead, SUserAddSkill, SPostInfo, SPostAdd, STokenResponse, SUsersPage, ExportFormat, SSkillsBulkAdd, SSkillsBulkResult, SUsersBulkAdd, SUsersBulkResult
 from core.redis import RedisDep
 import json
 from pydantic import TypeAdapter
 from utils import cache_response, clean_cache, rate_limit
 import asyncio
-from auth import get_current_user, RoleCheck
+from auth import get_current_principal, get_current_user, RoleCheck
 from models.user import UserRole
 
 only_admin = [UserRole.ADMIN]
 MAX_AGE = 30 * 24 * 60 * 60
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv'
+}
 
 router = APIRouter(prefix='/users')
 
@@ -87,12 +91,35 @@ async def logout(
         'msg': 'Вы успешно вышли из аккаунта'
     }
 
+@router.post('/logout_all')
+async def logout_all(
+    response: Response,
+    service: ServiceToken,
+    user = Depends(get_current_principal)
+):
+    sessions = await service.logout_all(user_id=user.id)
+    
+    response.delete_cookie(
+        key = 'refresh_token',
+        httponly=True,
+        secure=True,
+        samesite='lax'
+    )
+    
+    return {
+        'status': 'ok',
+        'msg': f'Вы вышли из аккаунта на всех устройствах, завершено сессий: {sessions}'
+    }
+
 @router.get('', status_code=status.HTTP_200_OK)
-@rate_limit(limit=5, period=20)
-@cache_response(expire=100, model=SUserRead)
-async def get_all_users(service: ServiceUserRead, request: Request) -> List[SUserRead]:
+@rate_limit(limit=5, period=20, algorithm='hybrid', batch=5)
+@cache_response(expire=100, model=SUsersPage)
+async def get_all_users(service: ServiceUserRead, 
+                        request: Request, 
+                        limit: int = Query(default=20, ge=1, le=100), 
+                        cursor: str | None = None) -> SUsersPage:
     
-    users = await service.get_all_users()
+    users = await service.get_all_users(limit=limit, cursor=cursor)
     
     return users
           
@@ -103,8 +130,18 @@ async def create_user(user: SUserAdd, service: ServiceUserReg) -> SUserRead:
     
     return new_user
 
+@router.post('/create_users', status_code=status.HTTP_200_OK, response_model=SUsersBulkResult)
+@clean_cache(get_all_users)
+async def create_users(bulk: SUsersBulkAdd, service: ServiceUserReg, user = Depends(RoleCheck(only_admin))):
+    return await service.register_many(users=bulk.users)
+
+# Полная запись текущего юзера - через PrincipalCache, без запроса в базу на каждый вызов
+@router.get('/me', status_code=status.HTTP_200_OK, response_model=SUserRead)
+async def get_me(user: SUserRead = Depends(get_current_user)):
+    return user
+
 @router.get('/one_user/{user_id:int}', status_code=status.HTTP_200_OK)
-@cache_response(expire=100, model=SUserRead)
+@cache_response(expire=100, model=SUserRead, entity='user_id', l1=True)
 async def get_user(user_id: int, service: ServiceUserRead) -> SUserRead:
     
     user = await service.get_one_user(user_data=user_id)
@@ -112,12 +149,12 @@ async def get_user(user_id: int, service: ServiceUserRead) -> SUserRead:
     return user
     
 @router.get('/user_skills/{user_id:int}', status_code=status.HTTP_200_OK, response_model=SUserSKillsRead)
-@cache_response(expire=100, model=SUserSKillsRead)
+@cache_response(expire=100, model=SUserSKillsRead, entity='user_id', l1=True)
 async def get_user_skills(user_id: int, service: ServiceUserRead):
     return await service.get_user_skills(user_id=user_id)
 
 @router.delete('/del_user/{user_id:int}', status_code=status.HTTP_204_NO_CONTENT)
-@clean_cache(get_all_users)
+@clean_cache(get_all_users, get_user, get_user_skills, entity='user_id')
 async def delete_user(user_id: int, service: ServiceUserRedaction, user = Depends(RoleCheck(only_admin))):
     
     await service.delete_user(user_id=user_id)
@@ -125,12 +162,18 @@ async def delete_user(user_id: int, service: ServiceUserRedaction, user = Depend
     return
 
 @router.post('/add_skill', status_code=status.HTTP_202_ACCEPTED, response_model=SUserSKillsRead)
-@clean_cache(get_user_skills)
-async def user_add_skill(skill: SUserAddSkill, service: ServiceUserRedaction, user = Depends(get_current_user)):
+@clean_cache(get_user_skills, entity=lambda kwargs: kwargs['user'].id)
+async def user_add_skill(skill: SUserAddSkill, service: ServiceUserRedaction, user = Depends(get_current_principal)):
     update_user = await service.add_skill(user_id=user.id, skill=skill)
     
     return update_user
 
+# Один юзер - сбрасываем кеш скиллов только ему, несколько - кеш функции целиком
+@router.post('/skills/bulk', status_code=status.HTTP_202_ACCEPTED, response_model=SSkillsBulkResult)
+@clean_cache(get_user_skills, entity=lambda kwargs: kwargs['bulk'].user_ids[0] if len(set(kwargs['bulk'].user_ids)) == 1 else None)
+async def users_add_skills_bulk(bulk: SSkillsBulkAdd, service: ServiceUserRedaction, user = Depends(RoleCheck(only_admin))):
+    return await service.add_skills_bulk(bulk=bulk)
+
 @router.post('/{user_id:int}/create_post', status_code=status.HTTP_201_CREATED, response_model=SPostInfo)
 async def create_post(user_id: int, post: SPostAdd, service: ServicePost):
     new_post = await service.add_post(user_id=user_id, 
@@ -140,7 +183,27 @@ async def create_post(user_id: int, post: SPostAdd, service: ServicePost):
 
 @router.get('/posts/get_all', status_code=status.HTTP_200_OK, response_model=list[SPostInfo])
 @cache_response(expire=60, model=SPostInfo)
-async def get_all_posts(service: ServicePost):
+async def get_all_posts(service: ServicePostRead):
     result = await service.get_all_posts()
     
-    return result
\ No newline at end of file
+    return result
+
+@router.get('/export/users', status_code=status.HTTP_200_OK)
+async def export_users(service: ServiceExport, 
+                       fmt: ExportFormat = Query(default=ExportFormat.ndjson, alias='format'), 
+                       user = Depends(RoleCheck(only_admin))):
+    return StreamingResponse(
+        service.export_users(fmt=fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="users.{fmt.value}"'}
+    )
+
+@router.get('/export/posts', status_code=status.HTTP_200_OK)
+async def export_posts(service: ServiceExport, 
+                       fmt: ExportFormat = Query(default=ExportFormat.ndjson, alias='format'), 
+                       user = Depends(RoleCheck(only_admin))):
+    return StreamingResponse(
+        service.export_posts(fmt=fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="posts.{fmt.value}"'}
+    )
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, field_validator, ConfigDict, RootModel, A
 from enum import Enum
 from typing import List
 from repository.user import Cache
+from models.user import UserRole
+from config import settings_hash
 
 class OnCity(str, Enum):
     moscow = 'Москва'
@@ -10,6 +12,10 @@ class OnCity(str, Enum):
     sochi = 'Сочи'
     london = 'Лондон'
     
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+    
 class DisplayNameStr(RootModel):
     root: str | None 
     
@@ -59,7 +65,41 @@ class SUserRead(SUserBase):
     
     model_config = ConfigDict(populate_by_name=True,
                               from_attributes=True)
+    
+    # Строка из проекции репозитория (id, name, age, role, city) - данные из базы уже валидны,
+    # поэтому собираем без валидации
+    @classmethod
+    def from_row(cls, row) -> 'SUserRead':
+        return cls.model_construct(
+            id=row.id,
+            name=row.name,
+            age=row.age,
+            city=DisplayNameStr.model_construct(root=row.city),
+            role=row.role.value
+        )
+    
+# Элементы проверяет сервис по одному: кривой элемент попадает в errors, а не роняет всю пачку с 422
+class SUsersBulkAdd(BaseModel):
+    users: List[dict] = Field(min_length=1, max_length=settings_hash.BULK_MAX_USERS)
+    
+class SBulkItemError(BaseModel):
+    index: int
+    name: str | None = None
+    error: str
+    
+class SUsersBulkResult(BaseModel):
+    created: List[SUserRead]
+    errors: List[SBulkItemError]
+    
+class SUsersPage(BaseModel):
+    items: List[SUserRead]
+    next_cursor: str | None = None
 
+class SPrincipal(BaseModel):
+    id: int
+    name: str
+    role: UserRole
+    
 class SSkil(BaseModel):
     id: int
     name: str
@@ -85,6 +125,16 @@ class SUserAddSkill(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
     
+# Массовое добавление: каждый скилл каждому юзеру. Один юзер и много скиллов или
+# один скилл и много юзеров - частные случаи.
+class SSkillsBulkAdd(BaseModel):
+    user_ids: List[int] = Field(min_length=1, max_length=1000)
+    skills: List[str] = Field(min_length=1, max_length=100)
+    
+class SSkillsBulkResult(BaseModel):
+    added: int
+    skipped: int
+    
 class SPostAdd(BaseModel):
     content: str = Field(max_length=1000)
     
@@ -96,6 +146,14 @@ class SPostInfo(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
     
+    # Строка с content, author_id и author_name из PostRepository
+    @classmethod
+    def from_row(cls, row) -> 'SPostInfo':
+        return cls.model_construct(
+            user=SUserReadBase.model_construct(id=row.author_id, name=row.author_name),
+            content=row.content
+        )
+    
 class STokenResponse(BaseModel):
     access_token: str
     token_type: str = 'bearer'
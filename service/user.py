@@ -1,14 +1,30 @@
-from repository.user import UserRepository, RepoDep, Cache, RepoPostDep, PostRepository, RepoRefreshDep, RefreshRepository
-from models.user import UsersModel, PostModel, RefreshSessionModel
-from schemas.user import SUserAdd, SUserRead, SUserSKillsRead, SUserAddSkill, SPostAdd, SPostInfo, SUserReadBase
-from core.security import hash_password, verify_password
-from auth import create_token
+from repository.user import UserRepository, RepoDep, Cache, RepoPostDep, PostRepository, RepoRefreshDep, BaseRefreshRepository, RefreshRepository, ReadRepoDep, ReadRepoPostDep
+from models.user import RefreshSessionModel, UserRole
+from schemas.user import SUserAdd, SUserRead, SUserSKillsRead, SUserAddSkill, SPostAdd, SPostInfo, SUsersPage, ExportFormat, SSkillsBulkAdd, SSkillsBulkResult, SUsersBulkResult, SBulkItemError
+from core.security import hash_password, hash_passwords, verify_password
+from auth import create_user_token
 from core.exceptions import NameRepeatError, UserNotFoundError, SkillsNotFoundError, SkillInListNotFoundError, AuthError, SkillAlreadyInUser
-from typing import List, Annotated
+from typing import List, Annotated, AsyncIterator
+from pydantic import ValidationError
 from fastapi import Depends
 from sqlalchemy.exc import IntegrityError
 import secrets 
+import csv
+import io
+import json
 from datetime import datetime, timedelta, timezone
+from utils import encode_cursor, decode_cursor, PrincipalCache
+from config import settings_jwt
+from database import new_session
+from core.metrics import metrics
+import asyncio
+
+DEFAULT_PAGE_SIZE = 20
+
+# Выгрузка копит строки в буфере и отдаёт их кусками примерно такого размера
+EXPORT_CHUNK_BYTES = 64 * 1024
+USERS_EXPORT_FIELDS = ['id', 'name', 'age', 'role', 'city', 'skills']
+POSTS_EXPORT_FIELDS = ['id', 'content', 'author_id', 'author_name']
 
 class UserRegistrationService:
     def __init__(self, repo: RepoDep):
@@ -16,29 +32,83 @@ class UserRegistrationService:
         
     async def register(self, user: SUserAdd) -> SUserRead:
         new_user_dict = user.model_dump()
-        new_user_dict['password'] = hash_password(new_user_dict['password'])
-        new_user_dict['city_id'] = Cache.get_city_id(user.city)
+        new_user_dict['password'] = await hash_password(new_user_dict['password'])
+        new_user_dict['city_id'] = await Cache.resolve_city_id(user.city)
+        new_user_dict['role'] = UserRole.USER
         new_user_dict.pop('city')
-        new_user_model = UsersModel(**new_user_dict)
         try:
-            new_user_create = await self.repo.create_user(new_user_model)
+            user_id = await self.repo.create_user(new_user_dict)
         except IntegrityError:
-            raise NameRepeatError(name= new_user_model.name)
+            raise NameRepeatError(name= user.name)
         
-        return SUserRead.model_validate(new_user_create)
+        return SUserRead(id=user_id, name=user.name, age=user.age, city=user.city.value, role=UserRole.USER.value)
+    
+    # Массовая регистрация. Ошибки (невалидные поля, имя занято, город неизвестен) копятся по каждому
+    # элементу и не мешают остальным. Пароли хешируются только у тех, кого реально будем вставлять.
+    async def register_many(self, users: List[dict | SUserAdd]) -> SUsersBulkResult:
+        errors: List[SBulkItemError] = []
+        valid: List[tuple[int, SUserAdd]] = []
+        pending = []
+        seen = set()
+        
+        for index, item in enumerate(users):
+            try:
+                valid.append((index, SUserAdd.model_validate(item)))
+            except ValidationError as e:
+                name = item.get('name') if isinstance(item, dict) else None
+                errors.append(SBulkItemError(
+                    index=index,
+                    name=name if isinstance(name, str) else None,
+                    error='; '.join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+                ))
+        
+        existing = await self.repo.get_existing_names([user.name for _, user in valid])
+        
+        for index, user in valid:
+            if user.name in existing or user.name in seen:
+                errors.append(SBulkItemError(index=index, name=user.name, error=NameRepeatError(name=user.name).detail))
+                continue
+            
+            try:
+                city_id = await Cache.resolve_city_id(user.city)
+            except ValueError as e:
+                errors.append(SBulkItemError(index=index, name=user.name, error=str(e)))
+                continue
+            
+            seen.add(user.name)
+            pending.append((index, user, city_id))
+            
+        hashes = await hash_passwords([user.password for _, user, _ in pending])
+        rows = [
+            {'name': user.name, 'age': user.age, 'city_id': city_id, 'password': password_hash, 'role': UserRole.USER}
+            for (_, user, city_id), password_hash in zip(pending, hashes)
+        ]
+        created_ids = {name: user_id for user_id, name in await self.repo.create_users(rows)}
+        created: List[SUserRead] = []
+        
+        for index, user, _ in pending:
+            if user.name not in created_ids:
+                # Имя заняли между проверкой и вставкой
+                errors.append(SBulkItemError(index=index, name=user.name, error=NameRepeatError(name=user.name).detail))
+                continue
+            
+            created.append(SUserRead(id=created_ids[user.name], name=user.name, age=user.age, city=user.city.value, role=UserRole.USER.value))
+            
+        errors.sort(key=lambda error: error.index)
+        return SUsersBulkResult(created=created, errors=errors)
     
     async def auth(self, user_name: str, user_password: str, token_service: 'ServiceToken'):
-        user = await self.repo.get_user_by_name(user_name=user_name)
+        user = await self.repo.get_user_credentials(user_name=user_name)
 
         if user is None:
             raise AuthError()
         
-        password_verify = verify_password(plain_password=user_password, hashed_password=user.password)
+        password_verify = await verify_password(plain_password=user_password, hashed_password=user.password)
         
         if not password_verify:
             raise AuthError()
         
-        token = create_token(data= {'sub': user.name})
+        token = create_user_token(user_id=user.id, user_name=user.name, role=user.role)
         
         refresh_model = await token_service.create_token(user_id=user.id)
     
@@ -50,13 +120,24 @@ class UserRegistrationService:
           
     
 class UserReadService:
-    def __init__(self, repo: RepoDep):
+    def __init__(self, repo: ReadRepoDep):
         self.repo = repo
             
-    async def get_all_users(self) -> List[SUserRead]:
-        users = await self.repo.get_all_users()
+    async def get_all_users(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None) -> SUsersPage:
+        after_id = decode_cursor(cursor) if cursor else None
+        
+        # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+        users = await self.repo.get_all_users(limit=limit + 1, after_id=after_id)
+        
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor(users[-1].id)
     
-        return [SUserRead.model_validate(user) for user in users]
+        return SUsersPage(
+            items=[SUserRead.from_row(user) for user in users],
+            next_cursor=next_cursor
+        )
     
     async def get_one_user(self, user_data: int | str) -> SUserRead:
         if isinstance(user_data, int):
@@ -67,7 +148,16 @@ class UserReadService:
         if user is None:
             raise UserNotFoundError()
             
-        return SUserRead.model_validate(user)
+        return SUserRead.from_row(user)
+    
+    async def get_principal_user(self, user_id: int) -> SUserRead:
+        user = await PrincipalCache.get(user_id)
+        
+        if user is None:
+            user = await self.get_one_user(user_data=user_id)
+            await PrincipalCache.set(user)
+            
+        return user
     
     async def get_user_skills(self, user_id: int) -> SUserSKillsRead:
         user = await self.repo.get_user_skills(user_id)
@@ -81,17 +171,40 @@ class UserRedService:
         
     async def delete_user(self, user_id) -> None:
         await self.repo.delete_user(user_id=user_id)
+        await PrincipalCache.invalidate(user_id)
         return 
     
     async def add_skill(self, user_id: int, skill: SUserAddSkill) -> SUserSKillsRead:
-        if skill.skill in Cache._skills:
-            try:
-                user = await self.repo.add_skill_at_user(user_id=user_id, skill_name=skill.skill)
-            except IntegrityError as e:
-                raise SkillAlreadyInUser(skill_name=skill.skill)
-            return SUserSKillsRead.model_validate(user)
-        else: 
-            raise SkillInListNotFoundError(skill_name=skill.skill)
+        skill_id = await self._skill_id(skill.skill)
+        
+        try:
+            added = await self.repo.add_skills([(user_id, skill_id)])
+        except IntegrityError:
+            raise UserNotFoundError()
+        
+        if not added:
+            raise SkillAlreadyInUser(skill_name=skill.skill)
+        
+        user = await self.repo.get_user_skills(user_id)
+        return SUserSKillsRead.model_validate(user)
+    
+    async def add_skills_bulk(self, bulk: SSkillsBulkAdd) -> SSkillsBulkResult:
+        skill_ids = [await self._skill_id(name) for name in dict.fromkeys(bulk.skills)]
+        pairs = [(user_id, skill_id) for user_id in dict.fromkeys(bulk.user_ids) for skill_id in skill_ids]
+        
+        try:
+            added = await self.repo.add_skills(pairs)
+        except IntegrityError:
+            raise UserNotFoundError()
+        
+        return SSkillsBulkResult(added=len(added), skipped=len(pairs) - len(added))
+    
+    @staticmethod
+    async def _skill_id(skill_name: str) -> int:
+        try:
+            return await Cache.resolve_skill_id(skill_name)
+        except ValueError:
+            raise SkillInListNotFoundError(skill_name=skill_name)
         
 class PostService:
     def __init__(self, user_repo: UserRepository, post_repo: PostRepository):
@@ -99,59 +212,46 @@ class PostService:
         self.post_repo = post_repo
         
     async def add_post(self, user_id: int, post: SPostAdd) -> SPostInfo:
-        user = await self.user_repo.get_one_user(user_id=user_id)
-        
-        if not user:
+        try:
+            new_post = await self.post_repo.add_post(user_id=user_id, content=post.content)
+        except IntegrityError:
             raise UserNotFoundError()
         
-        new_post = PostModel(**post.model_dump(),
-                            user_fk=user_id)
-        
-        create_post = await self.post_repo.add_post(user_id=user_id, post=new_post)
-        
-        return SPostInfo(
-            user=SUserReadBase.model_validate(user),
-            content=create_post.content
-        )
+        return SPostInfo.from_row(new_post)
     
     async def get_all_posts(self) -> list[SPostInfo]:
         posts = await self.post_repo.get_all_posts()
         
-        posts = [SPostInfo.model_validate(post) for post in posts]
+        posts = [SPostInfo.from_row(post) for post in posts]
 
         return posts 
     
 class TokenService:
-    def __init__(self, repo: RefreshRepository):
+    def __init__(self, repo: BaseRefreshRepository):
         self.repo = repo
         
-    async def create_token(self, user_id: int) -> RefreshSessionModel:
-        secret_token = secrets.token_urlsafe(64)
-        expires_at = datetime.now(timezone.utc) + timedelta(days=30)
-        new_refresh_token = RefreshSessionModel(
-            refresh_token=secret_token,
-            expires_at=expires_at,
+    @staticmethod
+    def _new_token(user_id: int | None = None) -> RefreshSessionModel:
+        return RefreshSessionModel(
+            refresh_token=secrets.token_urlsafe(64),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=settings_jwt.REFRESH_EXPIRE_DAYS),
             user_id=user_id
         )
-        refresh_token = await self.repo.create_token(token=new_refresh_token)
+        
+    async def create_token(self, user_id: int) -> RefreshSessionModel:
+        refresh_token = await self.repo.create_token(token=self._new_token(user_id=user_id))
         return refresh_token
     
+    # Старый токен удаляется и новый выдаётся одним запросом в одной транзакции: из двух
+    # одновременных refresh с одним токеном пройдёт только один.
     async def refresh_token(self, old_refresh_token: str):
-        session = await self.repo.get_token(token=old_refresh_token)
-        
-        if session is None:
-            raise AuthError(detail='Пользователь не найден!')
-        
-        if session.expires_at < datetime.now(timezone.utc):
-            await self.repo.delete_token(token=old_refresh_token)
-            raise AuthError(detail='Рефреш Токен истёк')
+        new_refresh_model = self._new_token()
+        user = await self.repo.rotate_token(old_token=old_refresh_token, new_token=new_refresh_model)
         
-        await self.repo.delete_token(token=old_refresh_token)
-        
-        from auth import create_token
+        if user is None:
+            raise AuthError(detail='Рефреш Токен истёк или не существует')
         
-        new_refresh_model = await self.create_token(user_id=session.user_id)
-        new_access_token = create_token(data = {'sub': str(session.user_id)})
+        new_access_token = create_user_token(user_id=user.id, user_name=user.name, role=user.role)
         
         return {
             'access_token': new_access_token,
@@ -161,11 +261,85 @@ class TokenService:
     async def delete_token(self, token: str):
         await self.repo.delete_token(token=token)
         return
+    
+    async def logout_all(self, user_id: int) -> int:
+        return await self.repo.delete_user_tokens(user_id=user_id)
+        
+# Пользователи бросают сессии без logout, и истёкшие строки в refresh_tokens никто не удаляет:
+# растут таблица и уникальный индекс по refresh_token. Чистим пачками, каждая пачка - своя
+# короткая транзакция. Граница now фиксируется на старте прогона, так что прогон конечен.
+class RefreshTokenSweeper:
+    @classmethod
+    async def sweep(cls) -> int:
+        now = datetime.now(timezone.utc)
+        total = 0
+        
+        while True:
+            async with new_session() as session:
+                deleted = await RefreshRepository(session).delete_expired(now=now, limit=settings_jwt.SWEEP_BATCH)
+            
+            total += deleted
+            
+            if deleted < settings_jwt.SWEEP_BATCH:
+                break
+            
+            await asyncio.sleep(settings_jwt.SWEEP_PAUSE)
+            
+        metrics.inc('refresh_tokens.sweep_runs')
+        metrics.inc('refresh_tokens.swept', total)
+        metrics.set('refresh_tokens.swept_last_run', total)
+        
+        return total
+    
+    @classmethod
+    async def run_periodically(cls):
+        while True:
+            try:
+                swept = await cls.sweep()
+                print(f'REFRESH: Удалено истёкших токенов: {swept}')
+            except Exception as e:
+                print(f'REFRESH: Ошибка чистки истёкших токенов: {e}')
+                
+            await asyncio.sleep(settings_jwt.SWEEP_INTERVAL)
+        
+class ExportService:
+    def __init__(self, user_repo: UserRepository, post_repo: PostRepository):
+        self.user_repo = user_repo
+        self.post_repo = post_repo
+        
+    def export_users(self, fmt: ExportFormat) -> AsyncIterator[str]:
+        return self._encode(self.user_repo.stream_users_export(), fmt, USERS_EXPORT_FIELDS)
+    
+    def export_posts(self, fmt: ExportFormat) -> AsyncIterator[str]:
+        return self._encode(self.post_repo.stream_posts_export(), fmt, POSTS_EXPORT_FIELDS)
+    
+    @staticmethod
+    async def _encode(rows: AsyncIterator[dict], fmt: ExportFormat, fields: list[str]) -> AsyncIterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        if fmt == ExportFormat.csv:
+            writer.writerow(fields)
+        
+        async for row in rows:
+            if fmt == ExportFormat.csv:
+                writer.writerow([';'.join(v) if isinstance(v, list) else v for v in (row[f] for f in fields)])
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False))
+                buffer.write('\n')
+                
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                
+        if buffer.tell():
+            yield buffer.getvalue()
         
 def get_user_reg_service(repo: RepoDep) -> UserRegistrationService:
     return UserRegistrationService(repo)
 
-def get_user_read_service(repo: RepoDep) -> UserReadService:
+def get_user_read_service(repo: ReadRepoDep) -> UserReadService:
     return UserReadService(repo)
 
 def get_user_redaction_service(repo: RepoDep) -> UserRedService:
@@ -174,11 +348,19 @@ def get_user_redaction_service(repo: RepoDep) -> UserRedService:
 def get_post_service(user_repo: RepoDep, post_repo: RepoPostDep) -> PostService:
     return PostService(user_repo, post_repo)
 
+def get_post_read_service(user_repo: ReadRepoDep, post_repo: ReadRepoPostDep) -> PostService:
+    return PostService(user_repo, post_repo)
+
 def get_token_service(repo: RepoRefreshDep) -> TokenService:
     return TokenService(repo=repo)
 
+def get_export_service(user_repo: RepoDep, post_repo: RepoPostDep) -> ExportService:
+    return ExportService(user_repo, post_repo)
+
 ServiceUserReg = Annotated[UserRegistrationService, Depends(get_user_reg_service)]
 ServiceUserRead = Annotated[UserReadService, Depends(get_user_read_service)]
 ServiceUserRedaction = Annotated[UserRedService, Depends(get_user_redaction_service)]
 ServicePost = Annotated[PostService, Depends(get_post_service)]
-ServiceToken = Annotated[TokenService, Depends(get_token_service)]
\ No newline at end of file
+ServicePostRead = Annotated[PostService, Depends(get_post_read_service)]
+ServiceToken = Annotated[TokenService, Depends(get_token_service)]
+ServiceExport = Annotated[ExportService, Depends(get_export_service)]
\ No newline at end of file
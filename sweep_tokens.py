@@ -0,0 +1,17 @@
+# Разовая чистка истёкших refresh-токенов, например из cron, когда фоновая задача в приложении выключена.
+#
+# Запуск из корня проекта: python -m sweep_tokens
+
+import asyncio
+from database import engine
+from service.user import RefreshTokenSweeper
+
+async def main():
+    try:
+        swept = await RefreshTokenSweeper.sweep()
+        print(f'Удалено истёкших refresh-токенов: {swept}')
+    finally:
+        await engine.dispose()
+
+if __name__ == '__main__':
+    asyncio.run(main())
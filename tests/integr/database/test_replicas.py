@@ -0,0 +1,86 @@
+import pytest
+import time
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database import ReplicaRouter, ReadSession, ReadSessionDep, SessionDep, ReadYourWritesMiddleware, STICKY_COOKIE
+
+# Мастер и реплики - отдельные файлы sqlite, в каждом таблица marker со своим именем:
+# по ответу видно, из какой базы пришло чтение.
+
+@pytest.fixture(scope='function')
+async def databases(tmp_path, mocker):
+    engines = {}
+    
+    for name in ('primary', 'a', 'b'):
+        engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/{name}.db')
+        async with engine.begin() as conn:
+            await conn.execute(text('CREATE TABLE marker (name VARCHAR)'))
+            await conn.execute(text('INSERT INTO marker VALUES (:name)'), {'name': name})
+        engines[name] = engine
+        
+    # Реплика, к которой не подключиться
+    engines['down'] = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/нет/такой/папки.db')
+    
+    makers = {name: async_sessionmaker(bind=engine, expire_on_commit=False) for name, engine in engines.items()}
+    mocker.patch('database.new_session', makers['primary'])
+    
+    yield makers
+    
+    for engine in engines.values():
+        await engine.dispose()
+        
+async def read_marker(session) -> str:
+    result = await session.execute(text('SELECT name FROM marker'))
+    return result.scalar_one()
+
+async def read_once(router: ReplicaRouter) -> str:
+    session = ReadSession(router)
+    try:
+        return await read_marker(session)
+    finally:
+        await session.close()
+
+async def test_reads_round_robin_across_replicas(databases):
+    router = ReplicaRouter(factories=[databases['a'], databases['b']], cooldown=5)
+    
+    assert [await read_once(router) for _ in range(4)] == ['a', 'b', 'a', 'b']
+
+async def test_failed_replica_falls_back_to_primary_and_cools_down(databases):
+    router = ReplicaRouter(factories=[databases['down'], databases['b']], cooldown=5)
+    
+    assert await read_once(router) == 'primary'
+    # Пока идёт cooldown, упавшая реплика пропускается
+    assert [await read_once(router) for _ in range(2)] == ['b', 'b']
+
+async def test_primary_used_when_all_replicas_down(databases):
+    router = ReplicaRouter(factories=[databases['down']], cooldown=5)
+    
+    assert [await read_once(router) for _ in range(2)] == ['primary', 'primary']
+
+async def test_read_your_writes_after_commit(databases, mocker):
+    mocker.patch('database.replica_router', ReplicaRouter(factories=[databases['a'], databases['b']], cooldown=5))
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+    
+    @app.get('/read')
+    async def read(session: ReadSessionDep):
+        return {'db': await read_marker(session)}
+    
+    @app.post('/write')
+    async def write(session: SessionDep):
+        await session.execute(text("UPDATE marker SET name = 'primary'"))
+        await session.commit()
+        return {'ok': True}
+    
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+        assert (await ac.get('/read')).json() == {'db': 'a'}
+        
+        response = await ac.post('/write')
+        assert STICKY_COOKIE in response.cookies
+        assert (await ac.get('/read')).json() == {'db': 'primary'}
+        
+        # Окно прошло - снова реплики
+        ac.cookies.set(STICKY_COOKIE, str(time.time() - 1))
+        assert (await ac.get('/read')).json() == {'db': 'b'}
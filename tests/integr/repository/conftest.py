@@ -35,4 +35,37 @@ async def db_session(engine):
 @pytest.fixture(scope='function')
 def UserRepo(db_session):
     user = UserRepository(session=db_session)
-    return user
\ No newline at end of file
+    return user
+
+# posts в SQLite не создать (составной первичный ключ с автоинкрементом), поэтому тестам,
+# которым посты не нужны, поднимаем только таблицы юзеров и скиллов
+@pytest.fixture(scope='session')
+async def users_engine():
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    tables = [Model.metadata.tables[name] for name in ('cities', 'users', 'skills', 'user_skills')]
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Model.metadata.create_all, tables=tables)
+        
+    yield engine
+    
+    await engine.dispose()
+    
+@pytest.fixture(scope='function')
+async def users_session(users_engine):
+    
+    connection = await users_engine.connect()
+    
+    transaction = await connection.begin()
+    
+    session = async_sessionmaker(bind=connection, expire_on_commit=False)()
+    
+    yield session
+    
+    await session.close()
+    await transaction.rollback()
+    await connection.close()
+    
+@pytest.fixture(scope='function')
+def UsersOnlyRepo(users_session):
+    return UserRepository(session=users_session)
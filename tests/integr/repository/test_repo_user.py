@@ -1,21 +1,24 @@
 import pytest
-from models.user import UsersModel
+from models.user import UsersModel, CityModel, SkillsModel
 
-async def test_create_user(UserRepo):
-    user = UsersModel(
-        name='Бобик',
-        age=20,
-        password='hashed_password'
-    )
+async def test_create_user(UsersOnlyRepo, users_session):
+    users_session.add(CityModel(id=1, city='Москва'))
+    await users_session.flush()
     
-    result = await UserRepo.create_user(user=user)
+    result = await UsersOnlyRepo.create_user(user={
+        'name': 'Бобик',
+        'age': 20,
+        'city_id': 1,
+        'password': 'hashed_password'
+    })
+    user = await UsersOnlyRepo.get_one_user(user_id=result)
     
-    assert hasattr(result, 'id')
-    assert result.name == 'Бобик'
+    assert isinstance(result, int)
+    assert (user.id, user.name, user.city) == (result, 'Бобик', 'Москва')
     
 async def test_get_all_users(UserRepo):
     
-    result = await UserRepo.get_all_users()
+    result = await UserRepo.get_all_users(limit=10)
     
     assert isinstance(result, list)
     assert len(result) == 0    
@@ -25,3 +28,11 @@ async def test_get_one_user(UserRepo):
     result = await UserRepo.get_one_user(user_id=1)
     
     assert result == None
+    
+async def test_add_skills_skips_duplicates(UsersOnlyRepo, users_session):
+    users_session.add_all([CityModel(id=1, city='Москва'), SkillsModel(id=1, name='Python', user_list=[])])
+    users_session.add(UsersModel(name='Бобик', age=20, city_id=1, password='hashed_password'))
+    await users_session.flush()
+    
+    assert await UsersOnlyRepo.add_skills([(1, 1)]) == [(1, 1)]
+    assert await UsersOnlyRepo.add_skills([(1, 1)]) == []
@@ -0,0 +1,48 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import HTTPException
+from auth import create_token, create_user_token, get_current_principal, RoleCheck
+from models.user import UserRole
+from service.user import TokenService
+
+@pytest.mark.auth
+async def test_principal_from_token():
+    token = create_user_token(user_id=7, user_name='Гоша', role=UserRole.ADMIN)
+    
+    principal = await get_current_principal(token=token)
+    
+    assert principal.id == 7
+    assert principal.name == 'Гоша'
+    assert principal.role == UserRole.ADMIN
+
+@pytest.mark.auth
+@pytest.mark.parametrize('token', [
+    create_token(data={'sub': 'Гоша'}),
+    'не-токен'
+])
+async def test_principal_bad_token(token):
+    with pytest.raises(HTTPException) as excinfo:
+        await get_current_principal(token=token)
+        
+    assert excinfo.value.status_code == 401
+
+@pytest.mark.auth
+async def test_role_check_without_db():
+    principal = await get_current_principal(token=create_user_token(user_id=1, user_name='Гоша', role='user'))
+    
+    with pytest.raises(HTTPException) as excinfo:
+        await RoleCheck([UserRole.ADMIN])(user=principal)
+        
+    assert excinfo.value.status_code == 403
+
+@pytest.mark.auth
+async def test_refresh_token_issues_user_token(mocker):
+    m_refresh_repo = mocker.AsyncMock()
+    m_refresh_repo.rotate_token.return_value = SimpleNamespace(id=1, name='Гоша', role=UserRole.USER)
+    
+    tokens = await TokenService(repo=m_refresh_repo).refresh_token(old_refresh_token='старый')
+    principal = await get_current_principal(tokens['access_token'])
+    
+    assert m_refresh_repo.rotate_token.await_args.kwargs['old_token'] == 'старый'
+    assert m_refresh_repo.rotate_token.await_args.kwargs['new_token'].refresh_token == tokens['refresh_token']
+    assert (principal.id, principal.name, principal.role) == (1, 'Гоша', UserRole.USER)
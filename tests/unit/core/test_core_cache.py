@@ -0,0 +1,31 @@
+import pytest
+from core.cache import TTLCache
+
+@pytest.mark.cache
+def test_ttl_cache_byte_limit():
+    cache = TTLCache(maxsize=100, ttl=60, max_bytes=10)
+    
+    cache.set('a', b'12345')
+    cache.set('b', b'12345')
+    cache.get('a')
+    cache.set('c', b'123')
+    
+    assert cache.get('b') is None
+    assert cache.get('a') == b'12345'
+    assert cache.bytes == 8
+    
+    cache.set('big', b'x' * 11)
+    
+    assert cache.get('big') is None
+    assert len(cache) == 2
+
+@pytest.mark.cache
+def test_ttl_cache_expiry():
+    cache = TTLCache(maxsize=10, ttl=60)
+    
+    cache.set('a', 1, ttl=-1)
+    cache.set('b', 2)
+    
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.pop_where(lambda key: key == 'b') == 1
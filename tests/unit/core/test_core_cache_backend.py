@@ -0,0 +1,41 @@
+import pytest
+import asyncio
+from core.cache_backend import MemoryBackend
+
+@pytest.mark.cache
+async def test_memory_backend_set_nx_and_lock():
+    backend = MemoryBackend(max_keys=10)
+    
+    assert await backend.set('lock', 'мой', nx=True) is True
+    assert await backend.set('lock', 'чужой', nx=True) is False
+    assert await backend.delete_if_equals('lock', 'чужой') is False
+    assert await backend.delete_if_equals('lock', 'мой') is True
+    assert await backend.get('lock') is None
+
+@pytest.mark.cache
+async def test_memory_backend_incr_keeps_ttl():
+    backend = MemoryBackend(max_keys=10)
+    
+    assert await backend.incr('gen', ttl=0.01) == 1
+    assert await backend.incr('gen') == 2
+    assert await backend.get('gen') == b'2'
+    
+    await asyncio.sleep(0.02)
+    
+    assert await backend.get('gen') is None
+    assert await backend.incr('gen') == 1
+
+@pytest.mark.cache
+async def test_memory_backend_lru_bound_and_lookup():
+    backend = MemoryBackend(max_keys=2)
+    
+    await backend.set('cache:f:1:hash', b'new')
+    await backend.incr('cache_gen:f')
+    key, value = await backend.lookup(['cache_gen:f'], 'cache:f', 'hash')
+    
+    assert (key, value) == ('cache:f:1:hash', b'new')
+    
+    await backend.set('other', b'x')
+    
+    assert await backend.get('cache_gen:f') is None
+    assert len(backend._data) == 2
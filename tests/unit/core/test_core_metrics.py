@@ -0,0 +1,16 @@
+import pytest
+from core.metrics import Metrics
+
+@pytest.mark.cache
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    
+    for value in (0.5, 3, 3, 700, 20000):
+        metrics.observe('wait_ms', value)
+        
+    histogram = metrics.snapshot()['histograms']['wait_ms']
+    
+    assert histogram['count'] == 5
+    assert histogram['sum'] == pytest.approx(20706.5)
+    assert (histogram['buckets']['1'], histogram['buckets']['5'], histogram['buckets']['1000']) == (1, 3, 4)
+    assert histogram['buckets']['10000'] == 4 and histogram['buckets']['+Inf'] == 5
@@ -0,0 +1,54 @@
+import pytest
+import asyncio
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+from core.redis import CircuitBreaker, RedisUnavailable
+
+def make_breaker(mocker, probe_result=None) -> CircuitBreaker:
+    return CircuitBreaker(probe=mocker.AsyncMock(side_effect=probe_result), failure_threshold=2, reset_timeout=0)
+
+@pytest.mark.cache
+async def test_breaker_opens_and_rejects_instantly(mocker):
+    breaker = make_breaker(mocker)
+    breaker.reset_timeout = 60
+    command = mocker.AsyncMock(side_effect=RedisConnectionError('down'))
+    
+    for _ in range(2):
+        with pytest.raises(RedisConnectionError):
+            await breaker.call(command)
+            
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    with pytest.raises(RedisUnavailable):
+        await breaker.call(command)
+        
+    assert command.await_count == 2
+
+@pytest.mark.cache
+async def test_breaker_ignores_command_errors(mocker):
+    breaker = make_breaker(mocker)
+    command = mocker.AsyncMock(side_effect=ResponseError('WRONGTYPE'))
+    
+    for _ in range(3):
+        with pytest.raises(ResponseError):
+            await breaker.call(command)
+            
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.cache
+async def test_breaker_half_open_probe(mocker):
+    breaker = make_breaker(mocker, probe_result=[RedisConnectionError('down'), None])
+    breaker.record_failure()
+    breaker.record_failure()
+    
+    # Первая проверка не прошла - снова открыт
+    assert breaker.allow() is False
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    await asyncio.sleep(0)
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    # Вторая прошла - закрыт, запросы снова идут в Redis
+    assert breaker.allow() is False
+    await asyncio.sleep(0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert await breaker.call(mocker.AsyncMock(return_value='PONG')) == 'PONG'
+    assert breaker.probe.await_count == 2
@@ -0,0 +1,89 @@
+import pytest
+import asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database import SessionDep, DBCheckoutMiddleware, LazySession, get_db, instrument_engine, engine_options
+from core.metrics import metrics, Metrics
+
+@pytest.fixture(scope='function')
+async def sqlite_sessions(mocker):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    instrument_engine(engine, registry=Metrics())
+    mocker.patch('database.new_session', async_sessionmaker(bind=engine, expire_on_commit=False))
+    metrics.reset()
+    
+    yield engine
+    
+    await engine.dispose()
+
+@pytest.mark.db
+async def test_unused_session_is_never_created(mocker):
+    factory = mocker.Mock()
+    mocker.patch('database.new_session', factory)
+    
+    dependency = get_db()
+    session = await anext(dependency)
+    await dependency.aclose()
+    
+    assert isinstance(session, LazySession) and not session.opened
+    factory.assert_not_called()
+
+@pytest.mark.db
+async def test_checkouts_counted_per_request(sqlite_sessions):
+    app = FastAPI()
+    app.add_middleware(DBCheckoutMiddleware)
+    
+    # Попадание в кеш: сессия пришла зависимостью, но запроса в базу нет
+    @app.get('/hit')
+    async def hit(session: SessionDep):
+        return {'ok': True}
+    
+    @app.get('/miss')
+    async def miss(session: SessionDep):
+        await session.execute(text('SELECT 1'))
+        return {'ok': True}
+    
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+        await ac.get('/hit')
+        await ac.get('/hit')
+        await ac.get('/miss')
+        
+    assert metrics.get('db.requests') == 3
+    assert metrics.get('db.requests_without_checkout') == 2
+    assert metrics.get('db.request_checkouts') == 1
+    assert metrics.get('db.sessions_opened') == 1
+    assert metrics.snapshot()['gauges']['db.checkouts_per_request'] == pytest.approx(1 / 3)
+
+@pytest.mark.db
+async def test_pool_wait_and_hold_are_measured(tmp_path, mocker):
+    mocker.patch.multiple('database.settings_db', POOL_SIZE=1, MAX_OVERFLOW=0, POOL_TIMEOUT=5)
+    url = f'sqlite+aiosqlite:///{tmp_path}/pool.db'
+    engine = create_async_engine(url, **engine_options(url))
+    pool_metrics = Metrics()
+    instrument_engine(engine, prefix='test.pool', registry=pool_metrics)
+    
+    try:
+        async with engine.connect() as first:
+            await first.execute(text('SELECT 1'))
+            assert pool_metrics.snapshot()['gauges']['test.pool.checked_out'] == 1
+            
+            async def second():
+                async with engine.connect() as conn:
+                    await conn.execute(text('SELECT 1'))
+                    
+            # Единственное соединение занято: второй ждёт, пока первое не вернётся в пул
+            waiting = asyncio.create_task(second())
+            await asyncio.sleep(0.2)
+            
+        await waiting
+    finally:
+        await engine.dispose()
+        
+    wait = pool_metrics.histogram('test.pool.checkout_wait_ms')
+    hold = pool_metrics.histogram('test.pool.checkout_hold_ms')
+    assert wait['count'] == 2 and wait['sum'] >= 150
+    assert hold['count'] == 2 and hold['buckets']['+Inf'] == 2
+    assert pool_metrics.snapshot()['gauges']['test.pool.checked_out'] == 0
+    assert 'test.pool.checked_out' not in metrics.snapshot()['gauges']
@@ -0,0 +1,22 @@
+import pytest
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+
+# Подменённая сессия: считаем execute и смотрим, какой SQL ушёл в базу
+@pytest.fixture(scope='function')
+def m_session(mocker):
+    session = mocker.AsyncMock()
+    result = mocker.Mock()
+    result.scalar_one.return_value = 7
+    result.one.return_value = SimpleNamespace(id=3, content='Привет', author_id=1, author_name='Гоша')
+    result.all.return_value = []
+    session.execute.return_value = result
+    return session
+
+# Последний запрос сессии в диалекте PostgreSQL
+@pytest.fixture(scope='function')
+def sql(m_session):
+    def compiled() -> str:
+        query = m_session.execute.await_args.args[0]
+        return str(query.compile(dialect=postgresql.dialect()))
+    return compiled
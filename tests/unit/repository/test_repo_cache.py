@@ -0,0 +1,48 @@
+import pytest
+import asyncio
+import time
+from repository.user import Cache
+
+@pytest.fixture(autouse=True)
+def dictionaries():
+    Cache._cities, Cache._skills = {'Москва': 1}, {}
+    Cache._reload_attempted_at = float('-inf')
+    yield
+    Cache._cities, Cache._skills = {}, {}
+
+@pytest.mark.cache
+async def test_miss_reloads_once_for_all_waiters(mocker):
+    async def reload():
+        await asyncio.sleep(0.01)
+        Cache._cities, Cache._skills = {'Москва': 1, 'Казань': 2}, {'Python': 7}
+        
+    m_reload = mocker.patch.object(Cache, '_reload', side_effect=reload)
+    
+    results = await asyncio.gather(*(Cache.resolve_city_id('Казань') for _ in range(10)))
+    
+    assert results == [2] * 10
+    assert await Cache.resolve_skill_id('Python') == 7
+    assert m_reload.await_count == 1
+
+@pytest.mark.cache
+async def test_miss_reload_is_throttled(mocker):
+    async def reload():
+        Cache._reload_attempted_at = time.monotonic()
+        
+    m_reload = mocker.patch.object(Cache, '_reload', side_effect=reload)
+    
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            await Cache.resolve_city_id('Атлантида')
+            
+    assert await Cache.resolve_city_id('Москва') == 1
+    assert m_reload.await_count == 1
+
+@pytest.mark.cache
+async def test_reload_error_does_not_break_lookup(mocker):
+    mocker.patch.object(Cache, '_reload', side_effect=ConnectionError('база недоступна'))
+    
+    assert await Cache.resolve_city_id('Москва') == 1
+    
+    with pytest.raises(ValueError):
+        await Cache.resolve_city_id('Казань')
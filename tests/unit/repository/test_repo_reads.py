@@ -0,0 +1,36 @@
+import pytest
+from repository.user import UserRepository, PostRepository
+
+# Чтение идёт проекциями: только нужные колонки, без пароля и без сборки ORM-объектов
+
+@pytest.mark.serviceread
+async def test_get_all_users_projection(m_session, sql):
+    await UserRepository(m_session).get_all_users(limit=10, after_id=5)
+    
+    assert sql().startswith(
+        'SELECT users.id, users.name, users.age, users.role, cities.city \nFROM users JOIN cities ON users.city_id = cities.id'
+    )
+
+@pytest.mark.serviceread
+@pytest.mark.parametrize('method, kwargs', [('get_one_user', {'user_id': 1}), ('get_user_by_name', {'user_name': 'Гоша'})])
+async def test_get_user_projection_has_no_password(m_session, sql, method, kwargs):
+    await getattr(UserRepository(m_session), method)(**kwargs)
+    
+    assert 'password' not in sql()
+    m_session.execute.return_value.one_or_none.assert_called_once()
+
+@pytest.mark.auth
+async def test_credentials_projection_skips_city(m_session, sql):
+    await UserRepository(m_session).get_user_credentials(user_name='Гоша')
+    
+    query = sql()
+    assert query.startswith('SELECT users.id, users.name, users.role, users.password')
+    assert 'cities' not in query
+
+@pytest.mark.serviceread
+async def test_get_all_posts_projection(m_session, sql):
+    await PostRepository(m_session).get_all_posts()
+    
+    assert sql().startswith(
+        'SELECT posts.content, users.id AS author_id, users.name AS author_name \nFROM posts JOIN users'
+    )
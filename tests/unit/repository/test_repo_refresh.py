@@ -0,0 +1,140 @@
+import pytest
+import hashlib
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql
+from repository.user import RefreshRepository, RedisRefreshRepository, give_refresh_repo
+from service.user import TokenService, RefreshTokenSweeper
+from models.user import RefreshSessionModel, UserRole
+from core.exceptions import AuthError
+from core.redis import redis_breaker
+from core.metrics import metrics
+
+@pytest.fixture(scope='function')
+def m_redis(mocker):
+    redis = mocker.Mock()
+    pipe = mocker.MagicMock()
+    pipe.execute = mocker.AsyncMock()
+    redis.pipeline.return_value.__aenter__ = mocker.AsyncMock(return_value=pipe)
+    redis.pipeline.return_value.__aexit__ = mocker.AsyncMock(return_value=False)
+    redis.get = mocker.AsyncMock(return_value=None)
+    redis.smembers = mocker.AsyncMock(return_value=set())
+    redis.pipe = pipe
+    redis_breaker.reset()
+    return redis
+
+@pytest.fixture(scope='function')
+def repo(m_redis, mocker):
+    for script in ('rotate_script', 'delete_script', 'delete_user_script'):
+        mocker.patch.object(RedisRefreshRepository, script, mocker.AsyncMock())
+    return RedisRefreshRepository(session=mocker.AsyncMock(), redis=m_redis)
+
+@pytest.mark.auth
+@pytest.mark.parametrize('backend, repo_class', [('sql', RefreshRepository), ('redis', RedisRefreshRepository)])
+async def test_give_refresh_repo_by_setting(backend, repo_class, mocker):
+    mocker.patch('repository.user.settings_jwt.REFRESH_BACKEND', backend)
+
+    assert isinstance(await give_refresh_repo(session=mocker.AsyncMock()), repo_class)
+
+@pytest.mark.auth
+async def test_redis_create_stores_hash_with_ttl(repo, m_redis):
+    token = RefreshSessionModel(
+        refresh_token='секрет', user_id=5,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=30)
+    )
+
+    await repo.create_token(token=token)
+
+    token_hash = hashlib.sha256('секрет'.encode()).hexdigest()
+    key, user_id = m_redis.pipe.set.call_args.args
+    assert key == f'refresh:{token_hash}' and user_id == 5
+    assert 29 * 86400 < m_redis.pipe.set.call_args.kwargs['ex'] <= 30 * 86400
+    m_redis.pipe.sadd.assert_called_once_with('refresh_user:5', token_hash)
+    m_redis.pipe.execute.assert_awaited_once()
+
+@pytest.mark.auth
+async def test_redis_rotation_rejects_missing_token(repo):
+    with pytest.raises(AuthError):
+        await TokenService(repo).refresh_token(old_refresh_token='истёк')
+
+    repo.rotate_script.assert_not_awaited()
+    repo.session.execute.assert_not_awaited()
+
+@pytest.mark.auth
+async def test_redis_rotation_rejects_concurrent_rotation(repo, m_redis):
+    m_redis.get.return_value = '1'
+    repo.rotate_script.return_value = None
+
+    with pytest.raises(AuthError):
+        await TokenService(repo).refresh_token(old_refresh_token='старый')
+
+    repo.session.execute.assert_not_awaited()
+
+@pytest.mark.auth
+async def test_redis_rotation_issues_new_pair(repo, m_redis, mocker):
+    m_redis.get.return_value = '1'
+    repo.rotate_script.return_value = '1'
+    result = mocker.Mock()
+    result.one_or_none.return_value = SimpleNamespace(id=1, name='Гоша', role=UserRole.USER)
+    repo.session.execute.return_value = result
+
+    tokens = await TokenService(repo).refresh_token(old_refresh_token='старый')
+
+    keys = repo.rotate_script.await_args.kwargs['keys']
+    assert keys[0] == f"refresh:{hashlib.sha256('старый'.encode()).hexdigest()}"
+    assert keys[1] == f"refresh:{hashlib.sha256(tokens['refresh_token'].encode()).hexdigest()}"
+    assert keys[2] == 'refresh_user:1'
+    assert repo.rotate_script.await_args.kwargs['client'] is m_redis
+    repo.session.execute.assert_awaited_once()
+    repo.delete_script.assert_not_awaited()
+
+@pytest.mark.auth
+async def test_redis_rotation_drops_session_of_deleted_user(repo, m_redis, mocker):
+    m_redis.get.return_value = '1'
+    repo.rotate_script.return_value = '1'
+    result = mocker.Mock()
+    result.one_or_none.return_value = None
+    repo.session.execute.return_value = result
+
+    with pytest.raises(AuthError):
+        await TokenService(repo).refresh_token(old_refresh_token='старый')
+
+    new_hash = repo.rotate_script.await_args.kwargs['args'][1]
+    assert repo.delete_script.await_args.kwargs['keys'] == [f'refresh:{new_hash}', 'refresh_user:1']
+
+@pytest.mark.auth
+async def test_redis_logout_all(repo, m_redis):
+    m_redis.smembers.return_value = {'a'}
+    repo.delete_user_script.return_value = 1
+
+    assert await TokenService(repo).logout_all(user_id=5) == 1
+    assert repo.delete_user_script.await_args.kwargs['keys'] == ['refresh_user:5', 'refresh:a']
+    assert repo.delete_user_script.await_args.kwargs['args'] == ['a']
+
+@pytest.mark.auth
+async def test_delete_expired_bounded_chunk(mocker):
+    session = mocker.AsyncMock()
+    session.execute.return_value.rowcount = 2
+
+    deleted = await RefreshRepository(session).delete_expired(now=datetime.now(timezone.utc), limit=500)
+    query = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+
+    assert deleted == 2
+    assert query.startswith('DELETE FROM refresh_tokens WHERE refresh_tokens.id IN (SELECT refresh_tokens.id')
+    assert 'LIMIT' in query and 'FOR UPDATE SKIP LOCKED' in query
+    session.commit.assert_awaited_once()
+
+@pytest.mark.auth
+async def test_sweeper_deletes_in_chunks_until_short_chunk(mocker):
+    mocker.patch('service.user.settings_jwt.SWEEP_BATCH', 3)
+    mocker.patch('service.user.settings_jwt.SWEEP_PAUSE', 0)
+    mocker.patch('service.user.new_session', return_value=mocker.AsyncMock())
+    delete_expired = mocker.patch.object(RefreshRepository, 'delete_expired', side_effect=[3, 3, 1])
+    metrics.reset()
+
+    assert await RefreshTokenSweeper.sweep() == 7
+    assert delete_expired.await_count == 3
+    # Граница одна на весь прогон
+    assert len({call.kwargs['now'] for call in delete_expired.await_args_list}) == 1
+    assert metrics.get('refresh_tokens.swept') == 7
+    assert metrics.get('refresh_tokens.swept_last_run') == 7
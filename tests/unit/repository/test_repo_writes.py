@@ -0,0 +1,88 @@
+import pytest
+from types import SimpleNamespace
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql
+from repository.user import UserRepository, PostRepository, RefreshRepository, Cache, INSERT_BATCH_SIZE
+from service.user import UserRegistrationService, PostService, TokenService
+from schemas.user import SUserAdd, SPostAdd
+from models.user import UserRole
+from core.exceptions import AuthError
+
+# Сколько запросов уходит в базу на запись. Сессия подменена: считаем execute и следим,
+# что refresh (второй запрос за тем, что мы и так знаем) больше не вызывается.
+#
+#   эндпоинт                     было                                      стало
+#   POST /users/create_user      INSERT + SELECT city_obj (refresh)        1 INSERT ... RETURNING id
+#   POST /users/{id}/create_post SELECT user+city, INSERT, SELECT (refresh) 1 INSERT ... RETURNING в CTE + join users
+#   refresh-токен (логин)        INSERT + SELECT (refresh)                 1 INSERT
+#   POST /users/refresh          SELECT, DELETE+commit, SELECT user,       1 запрос: DELETE ... RETURNING ->
+#                                INSERT+commit, SELECT (refresh)           INSERT ... SELECT -> SELECT users
+
+@pytest.mark.servicereg
+async def test_create_user_single_insert(m_session, sql, mocker):
+    mocker.patch.object(Cache, '_cities', {'Москва': 1})
+    mocker.patch('service.user.hash_password', return_value='hash')
+    
+    user = await UserRegistrationService(UserRepository(m_session)).register(
+        SUserAdd(name='Боб', age=30, password='Bob123', city='Москва')
+    )
+    
+    assert m_session.execute.await_count == 1
+    assert 'RETURNING users.id' in sql()
+    m_session.refresh.assert_not_awaited()
+    assert (user.id, user.city.root, user.role) == (7, 'Москва', 'user')
+
+@pytest.mark.servicereg
+async def test_add_post_single_statement(m_session, sql):
+    service = PostService(UserRepository(m_session), PostRepository(m_session))
+    
+    post = await service.add_post(user_id=1, post=SPostAdd(content='Привет'))
+    
+    assert m_session.execute.await_count == 1
+    assert sql().startswith('WITH new_post AS')
+    m_session.refresh.assert_not_awaited()
+    assert (post.user.id, post.user.name, post.content) == (1, 'Гоша', 'Привет')
+
+@pytest.mark.auth
+async def test_create_refresh_token_single_insert(m_session, sql):
+    token = await TokenService(RefreshRepository(m_session)).create_token(user_id=1)
+    
+    assert m_session.execute.await_count == 1
+    assert sql().startswith('INSERT INTO refresh_tokens')
+    m_session.refresh.assert_not_awaited()
+    assert token.user_id == 1
+    assert token.expires_at > datetime.now(timezone.utc)
+
+@pytest.mark.auth
+async def test_refresh_rotation_single_statement(m_session, sql):
+    m_session.execute.return_value.one_or_none.return_value = SimpleNamespace(id=1, name='Гоша', role=UserRole.USER)
+    
+    tokens = await TokenService(RefreshRepository(m_session)).refresh_token(old_refresh_token='старый')
+    query = sql()
+    
+    assert m_session.execute.await_count == 1
+    assert m_session.commit.await_count == 1
+    assert query.startswith('WITH old_token AS')
+    assert 'refresh_tokens.expires_at > now() RETURNING refresh_tokens.user_id' in query
+    assert tokens['refresh_token'] != 'старый'
+
+@pytest.mark.auth
+async def test_refresh_rotation_rejects_used_token(m_session):
+    m_session.execute.return_value.one_or_none.return_value = None
+    
+    with pytest.raises(AuthError):
+        await TokenService(RefreshRepository(m_session)).refresh_token(old_refresh_token='уже использован')
+
+@pytest.mark.servicereg
+async def test_add_skills_in_chunks(m_session, mocker):
+    m_session.get_bind = mocker.Mock(return_value=SimpleNamespace(dialect=postgresql.dialect()))
+    m_session.execute.side_effect = lambda query: [SimpleNamespace(user_id=1, skill_id=1)]
+    pairs = [(user_id, 1) for user_id in range(INSERT_BATCH_SIZE * 2 + 1)]
+    
+    added = await UserRepository(m_session).add_skills(pairs)
+    
+    statements = [call.args[0].compile(dialect=postgresql.dialect()) for call in m_session.execute.await_args_list]
+    assert len(statements) == 3
+    assert max(len(statement.params) for statement in statements) == INSERT_BATCH_SIZE * 2
+    assert len(added) == 3
+    m_session.commit.assert_awaited_once()
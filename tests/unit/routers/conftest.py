@@ -2,7 +2,7 @@ import pytest
 from main import app
 from database import get_db
 from service.user import get_user_read_service, get_user_reg_service, UserReadService, UserRegistrationService
-from schemas.user import SUserRead, SUserAdd
+from schemas.user import SUserRead, SUserAdd, SUsersPage
 from core.exceptions import NameRepeatError
 
 @pytest.fixture(scope='function')
@@ -20,19 +20,19 @@ async def m_service(mocker):
     app.dependency_overrides[get_user_read_service] = lambda: m_service
     
     users = [
-        SUserRead(id=1, name='Егор', age=23),
-        SUserRead(id=2, name='Владимир', age=40),
-        SUserRead(id=3, name='Геннадий', age=35),
-        SUserRead(id=4, name='Дмитрий Колёсик', age=17)
+        SUserRead(id=1, name='Егор', age=23, city='Москва', role='user'),
+        SUserRead(id=2, name='Владимир', age=40, city='Москва', role='user'),
+        SUserRead(id=3, name='Геннадий', age=35, city='Казань', role='user'),
+        SUserRead(id=4, name='Дмитрий Колёсик', age=17, city='Казань', role='admin')
     ]
     
-    async def find_user_id(user_id:int):
+    async def find_user_id(user_data:int):
         for u in users:
-            if u.id == user_id:
+            if u.id == user_data:
                 return u
         return None
     
-    m_service.get_all_users.return_value = users
+    m_service.get_all_users.return_value = SUsersPage(items=users)
     m_service.get_one_user.side_effect = find_user_id
     
     yield m_service
@@ -55,7 +55,9 @@ async def m_reg_service(mocker):
         new_user = SUserRead(
             id=len(users) + 1,
             name = user.name,
-            age=user.age
+            age=user.age,
+            city=user.city,
+            role='user'
         )
 
         users.append(new_user)
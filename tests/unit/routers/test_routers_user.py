@@ -3,6 +3,9 @@ from httpx import ASGITransport, AsyncClient
 from main import app
 from core.exceptions import UserNotFoundError
 from fastapi import HTTPException
+from auth import create_user_token
+from schemas.user import SUserRead
+from core.cache_backend import MemoryBackend
 
 
 @pytest.mark.get
@@ -11,7 +14,7 @@ async def test_get_all_users(m_session, m_service):
         response = await ac.get('/users')
     
     assert response.status_code == 200
-    assert len(response.json()) == 4
+    assert len(response.json()['items']) == 4
     
 @pytest.mark.get
 @pytest.mark.parametrize('user_id, exc_status_code, exc_name', [
@@ -33,16 +36,16 @@ async def test_get_one_user(m_session, m_service, user_id, exc_status_code, exc_
        
 @pytest.mark.post
 @pytest.mark.parametrize('user, user2, exc_status_code1, exc_status_code2', [
-    ({'name': 'Дралбаш Пишовин', 'age': 99, 'password': '123DRRD'},
-     {'name': 'Павел Шпраузер', 'age': 33, 'password': '123DRRD'},
+    ({'name': 'Дралбаш Пишовин', 'age': 99, 'password': '123DRRD', 'city': 'Москва'},
+     {'name': 'Павел Шпраузер', 'age': 33, 'password': '123DRRD', 'city': 'Москва'},
      201,
      201),
-     ({'name': 'Павел Шпраузер', 'age': 33, 'password': '123DRRD'},
-      {'name': 'Павел Шпраузер', 'age': 12, 'password': '123DRRD'},
+     ({'name': 'Павел Шпраузер', 'age': 33, 'password': '123DRRD', 'city': 'Москва'},
+      {'name': 'Павел Шпраузер', 'age': 12, 'password': '123DRRD', 'city': 'Москва'},
      201,
      409),
-     ({'name': 'Павел Шпраузер', 'age': 33, 'password': '123DRRD'},
-      {'name': 'Павел Шпраузер', 'age': -1, 'password': '123DRRD'},
+     ({'name': 'Павел Шпраузер', 'age': 33, 'password': '123DRRD', 'city': 'Москва'},
+      {'name': 'Павел Шпраузер', 'age': -1, 'password': '123DRRD', 'city': 'Москва'},
      201,
      422)
 ])
@@ -61,3 +64,29 @@ async def test_create_user(m_session, m_reg_service, user, user2, exc_status_cod
         
         
         
+
+@pytest.mark.get
+async def test_get_me(m_session, mocker):
+    m_principal_user = mocker.patch('service.user.UserReadService.get_principal_user', return_value=SUserRead(id=7, name='Гоша', age=30, city='Москва', role='user'))
+    token = create_user_token(user_id=7, user_name='Гоша', role='user')
+    
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+        response = await ac.get('/users/me', headers={'Authorization': f'Bearer {token}'})
+        
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Гоша'
+    m_principal_user.assert_awaited_once_with(user_id=7)
+
+@pytest.mark.ratelimit
+async def test_get_all_users_hybrid_limit(m_session, m_service, mocker):
+    backend = MemoryBackend(max_keys=1000)
+    mocker.patch('utils.cache_backend', backend)
+    mocker.patch.dict('utils._hybrid_limiters', clear=True)
+    reserve = mocker.spy(backend, 'reserve')
+    
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+        responses = [await ac.get('/users') for _ in range(20)]
+        
+    assert [response.status_code for response in responses] == [200] * 5 + [429] * 15
+    # Квоту окна забрали одной пачкой, все отказы - локально, без Redis
+    assert reserve.await_count == 1
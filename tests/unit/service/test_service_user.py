@@ -1,8 +1,11 @@
 import pytest
-from service.user import UserReadService, UserRegistrationService
-from core.exceptions import UserNotFoundError, NameRepeatError
-from schemas.user import SUserAdd
+from service.user import UserReadService, UserRegistrationService, ExportService, UserRedService, PostService
+from models.user import UserRole
+from core.exceptions import UserNotFoundError, NameRepeatError, InvalidCursorError, SkillAlreadyInUser, SkillInListNotFoundError
+from schemas.user import SUserAdd, SUserRead, ExportFormat, SUserAddSkill, SSkillsBulkAdd
+from repository.user import Cache
 from sqlalchemy.exc import IntegrityError
+from types import SimpleNamespace
 
 @pytest.mark.serviceread
 async def test_get_all_users(m_repo):
@@ -10,14 +13,37 @@ async def test_get_all_users(m_repo):
     
     result = await service.get_all_users()
     
-    assert len(result) == 2
-    assert not hasattr(result[0], 'password')
+    assert len(result.items) == 2
+    assert result.next_cursor is None
+    assert not hasattr(result.items[0], 'password')
+
+@pytest.mark.serviceread
+async def test_get_all_users_next_page(m_repo):
+    service = UserReadService(m_repo)
+    
+    first_page = await service.get_all_users(limit=1)
+    
+    assert len(first_page.items) == 1
+    assert first_page.next_cursor is not None
+    
+    await service.get_all_users(limit=1, cursor=first_page.next_cursor)
+    
+    args, kwargs = m_repo.get_all_users.call_args
+    
+    assert kwargs == {'limit': 2, 'after_id': first_page.items[-1].id}
+
+@pytest.mark.serviceread
+async def test_get_all_users_bad_cursor(m_repo):
+    service = UserReadService(m_repo)
+    
+    with pytest.raises(InvalidCursorError):
+        await service.get_all_users(cursor='не-курсор')
 
 @pytest.mark.serviceread   
 async def test_get_one_user(m_repo):
     service = UserReadService(m_repo)
     
-    result = await service.get_one_user(user_id=1)
+    result = await service.get_one_user(user_data=1)
     
     assert result.name == 'Гоша'
     assert not hasattr(result, 'password')
@@ -30,7 +56,7 @@ async def test_get_one_user_not_found(m_repo):
     service = UserReadService(my_repo)
     
     with pytest.raises(UserNotFoundError) as excinfo:
-        result = await service.get_one_user(user_id = 1)
+        result = await service.get_one_user(user_data = 1)
         
     assert excinfo.value.detail == 'Пользователь не найден!' 
 
@@ -39,14 +65,15 @@ async def test_get_one_user_not_found(m_repo):
     'giveError',
     'giveOK'
 ])
-async def test_registr_new_user(m_repo, m_repo_result):
+async def test_registr_new_user(m_repo, m_repo_result, mocker):
+    mocker.patch.object(Cache, '_cities', {'Москва': 1})
     
     if m_repo_result == 'giveError':
         m_repo.create_user.side_effect = IntegrityError(None, None, Exception())
         
         service = UserRegistrationService(m_repo)
     
-        user = SUserAdd(name='Боб', age=30, password='JAHFAJKSF123')
+        user = SUserAdd(name='Боб', age=30, password='JAHFAJKSF123', city='Москва')
         
         with pytest.raises(NameRepeatError) as excinfo:
             result = await service.register(user=user)
@@ -54,14 +81,14 @@ async def test_registr_new_user(m_repo, m_repo_result):
         args, kwargs = m_repo.create_user.call_args
         
         assert len(args) == 1
-        assert args[0].name == 'Боб'
-        assert args[0].password != 'JAHFAJKSF123'
+        assert args[0]['name'] == 'Боб'
+        assert args[0]['password'] != 'JAHFAJKSF123'
         assert excinfo.value.detail == 'Ошибка! Имя | Боб | занято! Попробуйте другое!'
         
     else:
         service = UserRegistrationService(m_repo)
         
-        user = SUserAdd(name='Боб', age=30, password='JAHFAJKSF123')
+        user = SUserAdd(name='Боб', age=30, password='JAHFAJKSF123', city='Москва')
         
         result = await service.register(user=user)
         
@@ -69,5 +96,125 @@ async def test_registr_new_user(m_repo, m_repo_result):
         
         assert not hasattr(result, 'password')
         assert len(args) == 1
-        assert args[0].name == 'Боб'
-        assert args[0].password != 'JAHFAJKSF123'
\ No newline at end of file
+        assert args[0]['name'] == 'Боб'
+        assert args[0]['city_id'] == 1
+        assert args[0]['password'] != 'JAHFAJKSF123'
+        assert (result.id, result.city.root) == (1, 'Москва')
+@pytest.mark.serviceread
+@pytest.mark.parametrize('fmt, expected', [
+    (ExportFormat.ndjson, '{"id": 1, "name": "Гоша", "skills": ["Python", "SQL"]}\n{"id": 2, "name": "Паша", "skills": []}\n'),
+    (ExportFormat.csv, 'id,name,skills\r\n1,Гоша,Python;SQL\r\n2,Паша,\r\n')
+])
+async def test_export_encode(fmt, expected):
+    async def rows():
+        yield {'id': 1, 'name': 'Гоша', 'skills': ['Python', 'SQL']}
+        yield {'id': 2, 'name': 'Паша', 'skills': []}
+        
+    chunks = [chunk async for chunk in ExportService._encode(rows(), fmt, ['id', 'name', 'skills'])]
+    
+    assert ''.join(chunks) == expected
+
+@pytest.mark.servicereg
+async def test_add_skill_writes_ids(m_repo, mocker):
+    mocker.patch.object(Cache, '_skills', {'Python': 7})
+    m_repo.add_skills.return_value = [(1, 7)]
+    m_repo.get_user_skills.return_value = SimpleNamespace(id=1, name='Гоша', skills_list=[SimpleNamespace(id=7, name='Python')])
+    
+    result = await UserRedService(m_repo).add_skill(user_id=1, skill=SUserAddSkill(skill='Python'))
+    
+    m_repo.add_skills.assert_awaited_once_with([(1, 7)])
+    assert result.skills_list[0].name == 'Python'
+    
+    m_repo.add_skills.return_value = []
+    
+    with pytest.raises(SkillAlreadyInUser):
+        await UserRedService(m_repo).add_skill(user_id=1, skill=SUserAddSkill(skill='Python'))
+
+@pytest.mark.servicereg
+async def test_add_skills_bulk(m_repo, mocker):
+    mocker.patch.object(Cache, '_skills', {'Python': 7, 'SQL': 8})
+    mocker.patch.object(Cache, '_reload_attempted_at', float('inf'))
+    m_repo.add_skills.side_effect = lambda pairs: pairs[1:]
+    service = UserRedService(m_repo)
+    
+    result = await service.add_skills_bulk(SSkillsBulkAdd(user_ids=[1, 2, 1], skills=['Python', 'SQL']))
+    
+    m_repo.add_skills.assert_awaited_once_with([(1, 7), (1, 8), (2, 7), (2, 8)])
+    assert (result.added, result.skipped) == (3, 1)
+    
+    with pytest.raises(SkillInListNotFoundError):
+        await service.add_skills_bulk(SSkillsBulkAdd(user_ids=[1], skills=['COBOL']))
+
+@pytest.mark.servicereg
+async def test_register_many_reports_conflicts(m_repo, mocker):
+    mocker.patch.object(Cache, '_cities', {'Москва': 1})
+    mocker.patch.object(Cache, '_reload_attempted_at', float('inf'))
+    m_hash = mocker.patch('service.user.hash_passwords', side_effect=lambda passwords: [f'hash:{p}' for p in passwords])
+    m_repo.get_existing_names.return_value = {'Занят'}
+    # 'Гонщик' займут между проверкой и вставкой
+    m_repo.create_users.side_effect = lambda rows: [(10 + i, row['name']) for i, row in enumerate(rows) if row['name'] != 'Гонщик']
+    users = [
+        SUserAdd(name='Боб', age=30, password='Bob123', city='Москва'),
+        SUserAdd(name='Занят', age=30, password='Bob123', city='Москва'),
+        SUserAdd(name='Боб', age=31, password='Bob123', city='Москва'),
+        SUserAdd(name='Лондонец', age=30, password='Bob123', city='Лондон'),
+        SUserAdd(name='Гонщик', age=30, password='Bob123', city='Москва')
+    ]
+    
+    result = await UserRegistrationService(m_repo).register_many(users)
+    
+    assert [user.name for user in result.created] == ['Боб']
+    assert result.created[0].id == 10
+    assert [(error.index, error.name) for error in result.errors] == [(1, 'Занят'), (2, 'Боб'), (3, 'Лондонец'), (4, 'Гонщик')]
+    m_hash.assert_awaited_once_with(['Bob123', 'Bob123'])
+    m_repo.create_users.assert_awaited_once()
+
+@pytest.mark.serviceread
+async def test_from_row_matches_validated_schema(m_repo):
+    row = m_repo.get_all_users.return_value[0]
+    
+    fast = SUserRead.from_row(row)
+    validated = SUserRead.model_validate({'id': 1, 'name': 'Гоша', 'age': 30, 'city_obj': 'Москва', 'role': 'user'})
+    
+    assert fast.model_dump_json() == validated.model_dump_json()
+    assert fast == validated
+
+@pytest.mark.serviceread
+async def test_get_all_posts_from_rows(mocker):
+    m_post_repo = mocker.AsyncMock()
+    m_post_repo.get_all_posts.return_value = [SimpleNamespace(content='Привет', author_id=1, author_name='Гоша')]
+    
+    posts = await PostService(user_repo=mocker.AsyncMock(), post_repo=m_post_repo).get_all_posts()
+    
+    assert posts[0].model_dump() == {'user': {'id': 1, 'name': 'Гоша'}, 'content': 'Привет'}
+
+@pytest.mark.auth
+async def test_auth_reads_credentials_projection(m_repo, mocker):
+    m_repo.get_user_credentials.return_value = SimpleNamespace(id=1, name='Гоша', role=UserRole.USER, password='hash')
+    mocker.patch('service.user.verify_password', return_value=True)
+    m_token_service = mocker.AsyncMock()
+    m_token_service.create_token.return_value = SimpleNamespace(refresh_token='рефреш')
+    
+    result = await UserRegistrationService(m_repo).auth(user_name='Гоша', user_password='Gosha333', token_service=m_token_service)
+    
+    assert result['refresh_token'] == 'рефреш'
+    m_repo.get_user_by_name.assert_not_awaited()
+
+@pytest.mark.servicereg
+async def test_register_many_reports_invalid_items(m_repo, mocker):
+    mocker.patch.object(Cache, '_cities', {'Москва': 1})
+    mocker.patch.object(Cache, '_reload_attempted_at', float('inf'))
+    mocker.patch('service.user.hash_passwords', side_effect=lambda passwords: [f'hash:{p}' for p in passwords])
+    m_repo.get_existing_names.return_value = set()
+    m_repo.create_users.side_effect = lambda rows: [(10 + i, row['name']) for i, row in enumerate(rows)]
+    users = [
+        {'name': 'Слабый', 'age': 30, 'password': 'bob', 'city': 'Москва'},
+        {'name': 'Боб', 'age': 30, 'password': 'Bob123', 'city': 'Москва'},
+        {'age': 30}
+    ]
+    
+    result = await UserRegistrationService(m_repo).register_many(users)
+    
+    assert [user.name for user in result.created] == ['Боб']
+    assert [(error.index, error.name) for error in result.errors] == [(0, 'Слабый'), (2, None)]
+    assert 'password' in result.errors[0].error
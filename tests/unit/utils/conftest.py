@@ -0,0 +1,8 @@
+import pytest
+from core.cache_backend import MemoryBackend
+
+@pytest.fixture(scope='function')
+def backend(mocker):
+    backend = MemoryBackend(max_keys=1000)
+    mocker.patch('utils.cache_backend', backend)
+    return backend
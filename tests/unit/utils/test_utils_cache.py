@@ -0,0 +1,230 @@
+import pytest
+import json
+import asyncio
+from fastapi import Response
+from utils import PrincipalCache, cache_response, cache_args_hash, versioned_key, clean_cache, clear_l1, drop_l1, listen_cache_invalidations, _l1
+from schemas.user import SUserRead
+from core.metrics import metrics
+from core.redis import CircuitBreaker
+from core.cache_backend import RedisBackend
+from config import settings_cache
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    PrincipalCache._local.clear()
+    clear_l1()
+    metrics.reset()
+
+@pytest.mark.cache
+async def test_principal_cache_tiers(backend):
+    user = SUserRead(id=1, name='Гоша', age=30, city='Москва', role='user')
+    
+    assert await PrincipalCache.get(1) is None
+    
+    await PrincipalCache.set(user)
+    assert await PrincipalCache.get(1) == user
+    
+    PrincipalCache._local.clear()
+    assert await PrincipalCache.get(1) == user
+    
+    assert metrics.get('principal_cache.misses') == 1
+    assert metrics.get('principal_cache.local_hits') == 1
+    assert metrics.get('principal_cache.redis_hits') == 1
+
+@pytest.mark.cache
+async def test_principal_cache_invalidate(backend):
+    await PrincipalCache.set(SUserRead(id=1, name='Гоша', age=30, city='Москва', role='user'))
+    
+    await PrincipalCache.invalidate(1)
+    
+    assert await PrincipalCache.get(1) is None
+    assert len(backend._data) == 0
+
+@pytest.mark.cache
+async def test_cache_response_raw_hit(backend, mocker):
+    source = mocker.AsyncMock(return_value=[SUserRead(id=1, name='Гоша', age=30, city='Москва', role='user')])
+    
+    @cache_response(expire=10, model=SUserRead)
+    async def get_users(page: int):
+        return await source(page)
+    
+    miss = await get_users(page=1)
+    hit = await get_users(page=1)
+    
+    assert isinstance(hit, Response)
+    assert hit.body == miss.body
+    assert json.loads(hit.body) == [{'id': 1, 'name': 'Гоша', 'age': 30, 'city': 'Москва', 'role': 'user'}]
+    assert source.await_count == 1
+
+@pytest.mark.cache
+async def test_cache_response_objects_mode(backend):
+    @cache_response(expire=10, raw=False)
+    async def get_user(user_id: int) -> SUserRead:
+        return SUserRead(id=user_id, name='Гоша', age=30, city='Москва', role='user')
+    
+    await get_user(user_id=1)
+    hit = await get_user(user_id=1)
+    
+    assert isinstance(hit, SUserRead)
+    assert hit.city.root == 'Москва'
+
+@pytest.mark.cache
+async def test_cache_response_single_flight(backend, mocker):
+    async def slow_users(page):
+        await asyncio.sleep(0.01)
+        return [SUserRead(id=1, name='Гоша', age=30, city='Москва', role='user')]
+    
+    source = mocker.AsyncMock(side_effect=slow_users)
+    
+    @cache_response(expire=10, model=SUserRead)
+    async def get_users(page: int):
+        return await source(page)
+    
+    responses = await asyncio.gather(*(get_users(page=1) for _ in range(10)))
+    
+    assert source.await_count == 1
+    assert len({response.body for response in responses}) == 1
+    assert metrics.get('cache.coalesced') == 9
+    assert not any(key.startswith('lock:') for key in backend._data._data)
+
+@pytest.mark.cache
+async def test_cache_response_waits_for_other_worker(backend, mocker):
+    source = mocker.AsyncMock(return_value={'id': 1})
+    
+    @cache_response(expire=10)
+    async def get_thing(thing_id: int) -> dict:
+        return await source(thing_id)
+    
+    cache_key = versioned_key('get_thing', 0, cache_args_hash(thing_id=1))
+    await backend.set(f'lock:{cache_key}', 'другой воркер', nx=True)
+    
+    async def other_worker():
+        await asyncio.sleep(0.02)
+        await backend.set(cache_key, b'{"id":1}')
+        
+    response, _ = await asyncio.gather(get_thing(thing_id=1), other_worker())
+    
+    assert response.body == b'{"id":1}'
+    assert source.await_count == 0
+    assert metrics.get('cache.lock_wait_hits') == 1
+
+@pytest.mark.cache
+async def test_clean_cache_bumps_generation(backend, mocker):
+    source = mocker.AsyncMock(return_value={'id': 1})
+    
+    @cache_response(expire=10)
+    async def get_thing(thing_id: int) -> dict:
+        return await source(thing_id)
+    
+    @clean_cache(get_thing)
+    async def update_thing(thing_id: int):
+        return None
+    
+    await get_thing(thing_id=1)
+    await get_thing(thing_id=1)
+    await update_thing(thing_id=1)
+    await get_thing(thing_id=1)
+    
+    assert source.await_count == 2
+    assert await backend.get('cache_gen:get_thing') == b'1'
+
+@pytest.mark.cache
+async def test_clean_cache_per_entity(backend, mocker):
+    source = mocker.AsyncMock(side_effect=lambda user_id: {'id': user_id})
+    
+    @cache_response(expire=10, entity='user_id')
+    async def get_skills(user_id: int) -> dict:
+        return await source(user_id)
+    
+    @clean_cache(get_skills, entity='user_id')
+    async def add_skill(user_id: int):
+        return None
+    
+    await get_skills(user_id=1)
+    await get_skills(user_id=2)
+    await add_skill(user_id=1)
+    await get_skills(user_id=1)
+    await get_skills(user_id=2)
+    
+    assert [call.args[0] for call in source.await_args_list] == [1, 2, 1]
+    assert await backend.get('cache_gen:get_skills') is None
+
+@pytest.mark.cache
+async def test_l1_in_front_of_redis(backend, mocker):
+    source = mocker.AsyncMock(side_effect=lambda user_id: {'id': user_id})
+    
+    @cache_response(expire=10, entity='user_id', l1=True)
+    async def get_user(user_id: int) -> dict:
+        return await source(user_id)
+    
+    @clean_cache(get_user, entity='user_id')
+    async def update_user(user_id: int):
+        return None
+    
+    lookup = mocker.spy(backend, 'lookup')
+    bump = mocker.spy(backend, 'bump')
+    
+    await get_user(user_id=1)
+    await get_user(user_id=2)
+    
+    assert (await get_user(user_id=1)).body == b'{"id":1}'
+    assert lookup.await_count == 2
+    assert metrics.get('cache.l1.hits') == 1
+    
+    await update_user(user_id=1)
+    await get_user(user_id=1)
+    await get_user(user_id=2)
+    
+    assert [call.args[0] for call in source.await_args_list] == [1, 2, 1]
+    assert json.loads(bump.await_args.args[2]) == [['get_user', 1]]
+    assert metrics.get('cache.l1.hits') == 2
+
+@pytest.mark.cache
+async def test_l1_dropped_by_other_worker(backend, mocker):
+    source = mocker.AsyncMock(return_value={'id': 1})
+    
+    @cache_response(expire=10, l1=True)
+    async def get_thing(thing_id: int) -> dict:
+        return await source(thing_id)
+    
+    await get_thing(thing_id=1)
+    
+    assert drop_l1('get_thing') == 1
+    
+    await get_thing(thing_id=1)
+    
+    assert metrics.get('cache.l1.hits') == 0
+    assert metrics.get('cache.l2.hits') == 1
+
+@pytest.mark.cache
+async def test_invalidation_reaches_listener(backend):
+    clear_l1()
+    _l1.set(('get_thing', None, 'hash'), b'{}')
+    listener = asyncio.create_task(listen_cache_invalidations())
+    await asyncio.sleep(0)
+    
+    await backend.bump({'cache_gen:get_thing': None}, settings_cache.INVALIDATION_CHANNEL, json.dumps([['get_thing', None]]))
+    await asyncio.sleep(0)
+    listener.cancel()
+    
+    assert len(_l1) == 0
+
+@pytest.mark.cache
+async def test_cache_response_bypass_when_breaker_open(mocker):
+    breaker = CircuitBreaker(probe=mocker.AsyncMock(), failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    redis = mocker.MagicMock()
+    mocker.patch('utils.cache_backend', RedisBackend(redis, redis, breaker))
+    source = mocker.AsyncMock(return_value=SUserRead(id=1, name='Гоша', age=30, city='Москва', role='user'))
+    
+    @cache_response(expire=10, model=SUserRead)
+    async def get_user(user_id: int):
+        return await source(user_id)
+    
+    first = await get_user(user_id=1)
+    second = await get_user(user_id=1)
+    
+    assert json.loads(first.body) == json.loads(second.body)
+    assert source.await_count == 2
+    redis.set.assert_not_called()
+    assert metrics.get('redis.breaker.rejected') > 0
@@ -0,0 +1,97 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+from utils import rate_limit, HybridLimiter, LocalLimiter
+from core.redis import CircuitBreaker
+from core.cache_backend import RedisBackend
+
+def make_app(algorithm: str = 'sliding_window') -> FastAPI:
+    app = FastAPI()
+    
+    @app.get('/limited')
+    @rate_limit(limit=5, period=20, algorithm=algorithm)
+    async def limited(name: str = 'мир'):
+        return {'hello': name}
+    
+    return app
+
+@pytest.mark.ratelimit
+async def test_rate_limit_headers(backend, mocker):
+    limit_check = mocker.spy(backend, 'rate_limit')
+    
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url='http://test') as ac:
+        allowed = await ac.get('/limited', params={'name': 'Гоша'})
+        for _ in range(4):
+            await ac.get('/limited')
+        denied = await ac.get('/limited')
+        
+    assert allowed.status_code == 200
+    assert allowed.json() == {'hello': 'Гоша'}
+    assert allowed.headers['RateLimit-Limit'] == '5'
+    assert allowed.headers['RateLimit-Remaining'] == '4'
+    assert allowed.headers['RateLimit-Reset'] == '20'
+    
+    assert denied.status_code == 429
+    assert denied.headers['Retry-After'] == '20'
+    assert denied.headers['RateLimit-Remaining'] == '0'
+    
+    algorithm, key, limit, period_ms, _ = limit_check.await_args.args
+    assert (algorithm, key, limit, period_ms) == ('sliding_window', 'rate_limit:limited:127.0.0.1', 5, 20000)
+    assert limit_check.await_count == 6
+
+@pytest.mark.ratelimit
+async def test_rate_limit_token_bucket(backend):
+    async with AsyncClient(transport=ASGITransport(app=make_app('token_bucket')), base_url='http://test') as ac:
+        statuses = [(await ac.get('/limited')).status_code for _ in range(6)]
+        
+    assert statuses == [200] * 5 + [429]
+
+@pytest.mark.ratelimit
+def test_rate_limit_unknown_algorithm():
+    with pytest.raises(ValueError):
+        rate_limit(limit=5, period=20, algorithm='угадайка')
+
+@pytest.mark.ratelimit
+async def test_hybrid_limiter_reserves_in_batches(backend, mocker):
+    reserve = mocker.spy(backend, 'reserve')
+    workers = [HybridLimiter(batch=10), HybridLimiter(batch=10)]
+    
+    results = [await workers[i % 2].check('rate_limit:key', 25, 20000) for i in range(40)]
+    allowed = sum(result[0] for result in results)
+    
+    assert allowed <= 25
+    assert allowed >= 25 - 10
+    assert reserve.await_count <= 6
+    assert results[-1][0] == 0
+    assert results[-1][2] > 0
+
+@pytest.mark.ratelimit
+async def test_hybrid_limiter_small_limit(backend):
+    workers = [HybridLimiter(batch=10, workers=2), HybridLimiter(batch=10, workers=2)]
+    
+    results = [await workers[i % 2].check('rate_limit:key', 5, 20000) for i in range(10)]
+    
+    assert [result[0] for result in results] == [1] * 5 + [0] * 5
+
+@pytest.mark.ratelimit
+def test_rate_limit_hybrid_batch_over_limit():
+    with pytest.raises(ValueError):
+        rate_limit(limit=5, period=20, algorithm='hybrid', batch=10)
+
+@pytest.mark.ratelimit
+async def test_rate_limit_local_fallback(mocker):
+    breaker = CircuitBreaker(probe=mocker.AsyncMock(), failure_threshold=3, reset_timeout=60)
+    redis = mocker.MagicMock()
+    script = mocker.AsyncMock(side_effect=RedisConnectionError('down'))
+    redis.register_script.return_value = script
+    mocker.patch('utils.cache_backend', RedisBackend(redis, redis, breaker))
+    mocker.patch('utils._local_limiter', LocalLimiter())
+    
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url='http://test') as ac:
+        statuses = [(await ac.get('/limited')).status_code for _ in range(7)]
+        
+    # Redis лежит: не 500, а локальный лимит, и после порога ошибок в Redis больше не ходим
+    assert statuses == [200] * 5 + [429] * 2
+    assert breaker.state == CircuitBreaker.OPEN
+    assert script.await_count == breaker.failure_threshold
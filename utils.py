@@ -1,99 +1,328 @@
-from core.redis import client
+from core.redis import log_redis_error
+from core.cache_backend import cache_backend, RATE_LIMIT_ALGORITHMS
 import hashlib
-from functools import wraps
-from typing import Any
+import inspect
+from functools import wraps, lru_cache
+from typing import Any, Callable
 import json
-from fastapi import Request, HTTPException, status
+import base64
+import asyncio
+import secrets
+import time
+import math
+from dataclasses import dataclass
+from fastapi import Request, Response, HTTPException, status
+from pydantic import TypeAdapter
+from core.exceptions import InvalidCursorError
+from core.cache import TTLCache, SingleFlight
+from core.metrics import metrics
+from config import settings_cache
+from schemas.user import SUserRead
 
-# Генератор ключей для наших данных в Redis
+# Генератор ключей для наших данных в Redis.
+# Реальный ключ в Redis содержит ещё и поколение функции: cache:<func>:<поколение>:<хеш аргументов>.
+# Если кеш объявил сущность (entity='user_id'), к поколению функции добавляется поколение этой
+# сущности: cache:<func>:<поколение>.<поколение сущности>:<хеш аргументов>.
+# Инвалидация - это INCR поколения, старые ключи просто доживают свой TTL.
 
-def cache_key_generator(func_name, *args, **kwargs):
-    prefix = f'cache:{func_name}'
-    
+def cache_args_hash(*args, **kwargs) -> str:
     filtered_args = [a for a in args if isinstance(a, (str, bool, float, int, str, dict, list, type(None)))]
     filtered_kwargs = {k:v for k,v in kwargs.items() if isinstance(v, (str, float, bool, int, str, dict, list, type(None)))}
     
     args_data = str(filtered_args) + str(sorted(filtered_kwargs.items()))
     
-    hashed_args = hashlib.md5(args_data.encode()).hexdigest()
+    return hashlib.md5(args_data.encode()).hexdigest()
+
+def generation_key(func_name: str) -> str:
+    return f'cache_gen:{func_name}'
+
+def entity_generation_key(func_name: str, entity: str, entity_value: Any) -> str:
+    return f'cache_gen:{func_name}:{entity}={entity_value}'
+
+def versioned_key(func_name: str, generation: int | str, args_hash: str) -> str:
+    return f'cache:{func_name}:{generation}:{args_hash}'
+
+# Курсор пагинации. Для клиента это непрозрачная строка, внутри - id последней записи страницы.
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({'id': last_id}).encode()
+    
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = data['id']
+    except Exception:
+        raise InvalidCursorError()
+    
+    if not isinstance(last_id, int):
+        raise InvalidCursorError()
+    
+    return last_id
+
+# Тип ответа эндпоинта: аннотация возврата, а если её нет - model (или список model).
+# TypeAdapter строится один раз на тип.
+
+@lru_cache(maxsize=None)
+def get_type_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+def resolve_response_type(return_type: Any, model: Any, is_list: bool) -> Any:
+    if return_type is not inspect.Signature.empty:
+        return return_type
+    
+    return list[model] if is_list else model
+
+async def cache_get(cache_key: str) -> bytes | None:
+    try:
+        return await cache_backend.get(cache_key)
+    except Exception as e:
+        log_redis_error('GET', e)
+        return None
+
+async def cache_lookup(func_name: str, args_hash: str, entity: str | None = None, entity_value: Any = None) -> tuple[str, bytes | None]:
+    keys = [generation_key(func_name)]
+    
+    if entity is not None and entity_value is not None:
+        keys.append(entity_generation_key(func_name, entity, entity_value))
+    
+    try:
+        return await cache_backend.lookup(keys, f'cache:{func_name}', args_hash)
+    except Exception as e:
+        log_redis_error('GET', e)
+        return versioned_key(func_name, 0, args_hash), None
+
+# Блокировку пересчёта держит бэкенд. Если он недоступен, считаем, что блокировка наша, и пересчитываем сами.
+
+async def acquire_lock(lock_key: str, token: str) -> bool:
+    try:
+        return await cache_backend.set(lock_key, token, ttl=settings_cache.LOCK_TTL_MS / 1000, nx=True)
+    except Exception as e:
+        log_redis_error('LOCK', e)
+        return True
+
+async def wait_for_fill(cache_key: str) -> bytes | None:
+    deadline = time.monotonic() + settings_cache.LOCK_WAIT
     
-    return f'{prefix}:{hashed_args}'
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings_cache.LOCK_POLL)
+        
+        cache_body = await cache_get(cache_key)
+        if cache_body is not None:
+            return cache_body
+        
+    return None
+
+# L1: тела ответов в памяти воркера. Ключ - (функция, сущность, хеш аргументов), поэтому
+# сбросить можно и функцию целиком, и одну сущность. Об инвалидациях воркеры узнают через pub/sub,
+# а если подписка отвалилась - L1 очищается целиком и живёт не дольше L1_TTL.
+
+_l1 = TTLCache(maxsize=settings_cache.L1_MAX_ENTRIES, ttl=settings_cache.L1_TTL, max_bytes=settings_cache.L1_MAX_BYTES)
+# Растёт при каждой инвалидации: не кладём в L1 то, что прочитали из Redis до неё
+_l1_epoch = 0
+
+def drop_l1(func_name: str, entity_value: Any = None) -> int:
+    global _l1_epoch
+    _l1_epoch += 1
+    
+    if entity_value is None:
+        return _l1.pop_where(lambda key: key[0] == func_name)
+    
+    entity_value = str(entity_value)
+    return _l1.pop_where(lambda key: key[0] == func_name and key[1] == entity_value)
+
+def clear_l1():
+    global _l1_epoch
+    _l1_epoch += 1
+    _l1.clear()
+
+async def listen_cache_invalidations():
+    while True:
+        try:
+            async for message in cache_backend.listen(settings_cache.INVALIDATION_CHANNEL):
+                for func_name, entity_value in json.loads(message):
+                    drop_l1(func_name, entity_value)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f'REDIS: Подписка на инвалидации потеряна: {e}')
+            # Пока подписки не было, сообщения могли пропасть
+            clear_l1()
+            await asyncio.sleep(1)
+
+metrics.register_gauge('cache.l1.hit_ratio', lambda: metrics.ratio('cache.l1.hits', 'cache.l1.misses'))
+metrics.register_gauge('cache.l2.hit_ratio', lambda: metrics.ratio('cache.l2.hits', 'cache.l2.misses'))
+metrics.register_gauge('cache.l1.entries', lambda: len(_l1))
+metrics.register_gauge('cache.l1.bytes', lambda: _l1.bytes)
+
+# Внутри воркера на ключ идёт одно вычисление, между воркерами - один держатель блокировки,
+# остальные ждут его результат. Если за LOCK_WAIT значение так и не появилось - считаем сами.
+_single_flight = SingleFlight()
 
 # Обёртка для работы с Redis. Чтение/Запись.
 # Обязательно используем wraps, чтобы FastAPI видел имя не обёртки, а самой функции роутера!
+# В Redis лежит уже готовое JSON-тело ответа. При raw=True (по умолчанию) на попадании
+# отдаём эти байты как есть, без json.loads, валидации и повторной сериализации в FastAPI.
+# raw=False - вернуть провалидированные объекты, если обёрнутую функцию зовут не как эндпоинт.
+# single_flight - на промахе одновременные запросы одного ключа ждут одно вычисление.
+# entity - имя параметра, который определяет сущность (например user_id), чтобы clean_cache
+# мог сбросить кеш только этой сущности.
+# l1 - держать копию тела ещё и в памяти воркера. Для маленьких горячих ответов, где
+# поход в Redis дороже всего остального.
 
-def cache_response(expire: int = 60, model: Any = None):
+def cache_response(expire: int = 60, model: Any = None, raw: bool = True, single_flight: bool = settings_cache.SINGLE_FLIGHT, entity: str | None = None, l1: bool = False):
     def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            cache_key = cache_key_generator(func.__name__, *args, **kwargs)
-            
-            cache_json = await client.get(cache_key)
+        return_type = inspect.signature(func).return_annotation
+        
+        async def fill(cache_key: str, args, kwargs) -> tuple[bytes | None, Any]:
+            lock_key = f'lock:{cache_key}'
+            token = secrets.token_hex(8)
+            locked = await acquire_lock(lock_key, token)
             
+            if not locked:
+                metrics.inc('cache.lock_waits')
+                cache_body = await wait_for_fill(cache_key)
+                
+                if cache_body is not None:
+                    metrics.inc('cache.lock_wait_hits')
+                    return cache_body, None
+                
+                metrics.inc('cache.lock_wait_timeouts')
+                
             try:
-                if cache_json != None:
-                    cache_data = json.loads(cache_json)
-                    
-                    if model:
-                        if isinstance(cache_data, list):
-                            result = [model.model_validate(item) for item in cache_data]
-                        elif isinstance(cache_data, dict):
-                            result = model.model_validate(cache_data)
-                            
-                        return result
+                data = await func(*args, **kwargs)
+                
+                if data is None or isinstance(data, Response):
+                    return None, data
+                
+                adapter = get_type_adapter(resolve_response_type(return_type, model, isinstance(data, list)))
+                cache_body = adapter.dump_json(adapter.validate_python(data, from_attributes=True), by_alias=True)
+                
+                try:
+                    await cache_backend.set(cache_key, cache_body, ttl=expire)
+                except Exception as e:
+                    log_redis_error('SET', e)
                     
-                    print(f'WARNING, cache_data is STRING')
-                    return cache_data
-    
-            except Exception as e:
-                print(f'Redis Error during GET: {e}')
+                return cache_body, data
+            finally:
+                if locked:
+                    try:
+                        await cache_backend.delete_if_equals(lock_key, token)
+                    except Exception as e:
+                        log_redis_error('UNLOCK', e)
+        
+        def respond(cache_body: bytes, data: Any = None):
+            if raw:
+                return Response(content=cache_body, media_type='application/json')
+            
+            if data is not None:
+                return data
+            
+            adapter = get_type_adapter(resolve_response_type(return_type, model, cache_body.startswith(b'[')))
+            return adapter.validate_json(cache_body)
+        
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            args_hash = cache_args_hash(*args, **kwargs)
+            entity_value = kwargs.get(entity) if entity else None
+            l1_key = (func.__name__, None if entity_value is None else str(entity_value), args_hash)
+            
+            if l1:
+                cache_body = _l1.get(l1_key)
                 
-            data = await func(*args, **kwargs)
+                if cache_body is not None:
+                    metrics.inc('cache.l1.hits')
+                    return respond(cache_body)
+                
+                metrics.inc('cache.l1.misses')
             
-            try:
-                if data != None:
-                    serializable_data = data
+            epoch = _l1_epoch
+            cache_key, cache_body = await cache_lookup(func.__name__, args_hash, entity, entity_value)
+            data = None
+            shared = False
+            
+            if cache_body is not None:
+                metrics.inc('cache.l2.hits')
+            else:
+                metrics.inc('cache.l2.misses')
+                
+                if single_flight:
+                    (cache_body, data), shared = await _single_flight.do(cache_key, lambda: fill(cache_key, args, kwargs))
                     
-                    if hasattr(serializable_data, 'model_dump'):
-                        serializable_data = serializable_data.model_dump() #type: ignore
+                    if shared:
+                        metrics.inc('cache.coalesced')
+                else:
+                    cache_body, data = await fill(cache_key, args, kwargs)
                     
-                    elif hasattr(serializable_data, '__iter__') and not isinstance(serializable_data, (str, dict)):
-                        serializable_data = [
-                            item.model_dump() if hasattr(item, 'model_dump') else item
-                            for item in serializable_data
-                        ]   
-                        
-                    await client.set(
-                        cache_key,
-                        json.dumps(serializable_data),
-                        ex = expire
-                    ) 
-            except Exception as e:
-                print(f'Redis Error during SET: {e}')
+                if cache_body is None:
+                    return data
+                
+            if l1 and epoch == _l1_epoch:
+                _l1.set(l1_key, cache_body, ttl=min(settings_cache.L1_TTL, expire))
             
-            return data
+            # Объекты лидера не раздаём другим запросам, каждому - свои
+            return respond(cache_body, None if shared else data)
+        
+        wrapper.cache_entity = entity
         return wrapper
     return decorator
 
-async def redis_cache_clear(target: Any):
-    func_name = target.__name__ if callable(target) else str(target)
+# Сбрасываем кеш целевых функций. Если у цели объявлена сущность и мы знаем её значение -
+# сбрасываем только эту сущность, иначе весь кеш функции. Все INCR уходят одним пайплайном.
+
+async def redis_cache_clear(*targets: Any, entity_value: Any = None):
+    func_keys = []
+    entity_keys = []
+    dropped = []
     
-    prefix = f'cache:{func_name}:*'
+    for target in targets:
+        func_name = target.__name__ if callable(target) else str(target)
+        target_entity = getattr(target, 'cache_entity', None)
+        
+        if target_entity is not None and entity_value is not None:
+            entity_keys.append(entity_generation_key(func_name, target_entity, entity_value))
+            dropped.append((func_name, entity_value))
+        else:
+            func_keys.append(generation_key(func_name))
+            dropped.append((func_name, None))
+            
+    for func_name, value in dropped:
+        drop_l1(func_name, value)
+            
+    # Поколение сущности может умереть только когда все ключи с ним уже протухли.
+    # Остальные воркеры сбросят свои L1 по опубликованному сообщению.
+    await cache_backend.bump(
+        {
+            **{key: None for key in func_keys},
+            **{key: settings_cache.ENTITY_GENERATION_TTL for key in entity_keys}
+        },
+        settings_cache.INVALIDATION_CHANNEL,
+        json.dumps(dropped)
+    )
+        
+    metrics.inc('cache.invalidations', len(func_keys) + len(entity_keys))
+    print(f'INVALIDATE: Успешно! | {", ".join(func_keys + entity_keys)}')
+
+# entity - имя параметра записи с id сущности или функция, достающая его из kwargs эндпоинта
+
+def resolve_entity(entity: str | Callable[[dict], Any] | None, kwargs: dict) -> Any:
+    if entity is None:
+        return None
     
-    cache_key = await client.keys(prefix)
+    if callable(entity):
+        return entity(kwargs)
     
-    if cache_key != None:
-        await client.delete(*cache_key)
-        print(f'DELETE KEYS: Успешно! | Ключей удалено: {len(cache_key)}')
+    return kwargs.get(entity)
         
-def clean_cache(target: Any):
+def clean_cache(*targets: Any, entity: str | Callable[[dict], Any] | None = None):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             result = await func(*args, **kwargs)
             
             try:
-                await redis_cache_clear(target=target)
+                await redis_cache_clear(*targets, entity_value=resolve_entity(entity, kwargs))
             except Exception as e:
                 print(f'REDIS: Ошибка очистки кеша: {e}')
                 
@@ -101,35 +330,223 @@ def clean_cache(target: Any):
         return wrapper
     return decorator
 
-def rate_limit(limit: int, period: int):
+# Лимитер запросов. Проверка и списание - одна атомарная операция бэкенда,
+# которая возвращает {разрешено, осталось, retry_after_ms, reset_ms}.
+
+# Гибридный режим: общий счётчик окна в Redis, но воркер забирает из него квоту пачками
+# по batch штук и дальше разрешает запросы локально, без похода в Redis.
+# Глобальный лимит никогда не превышается; неизрасходованная чужая квота пропадает до конца окна,
+# поэтому при нескольких воркерах разрешено может быть чуть меньше limit. Чтобы один воркер не
+# забрал всё окно, пачка не больше limit // workers. Для маленьких лимитов выгоды от пачек почти нет -
+# там лучше sliding_window.
+
+@dataclass
+class LocalQuota:
+    tokens: int
+    remaining: int
+    expires_at: float
+
+class HybridLimiter:
+    def __init__(self, batch: int, workers: int = 1, max_keys: int = 100_000):
+        self.batch = batch
+        self.workers = workers
+        self._quotas = TTLCache(maxsize=max_keys, ttl=60)
+        self._reservations = SingleFlight()
+        
+    async def _reserve(self, key: str, limit: int, period_ms: int) -> LocalQuota:
+        metrics.inc('rate_limit.hybrid.reservations')
+        
+        batch = max(1, min(self.batch, limit // self.workers))
+        grant, ttl_ms, remaining = await cache_backend.reserve(key, limit, period_ms, batch)
+        quota = LocalQuota(tokens=grant, remaining=remaining, expires_at=time.monotonic() + ttl_ms / 1000)
+        self._quotas.set(key, quota, ttl=ttl_ms / 1000)
+        
+        return quota
+        
+    async def check(self, key: str, limit: int, period_ms: int) -> tuple[int, int, int, int]:
+        quota = self._quotas.get(key)
+        
+        # Локальная квота кончилась, но в окне ещё что-то есть - дозабираем. Если окно
+        # исчерпано целиком, отказываем до его конца, не трогая Redis.
+        if quota is None or (quota.tokens <= 0 and quota.remaining > 0):
+            quota, _ = await self._reservations.do(key, lambda: self._reserve(key, limit, period_ms))
+        else:
+            metrics.inc('rate_limit.hybrid.local')
+            
+        reset_ms = max(0, int((quota.expires_at - time.monotonic()) * 1000))
+            
+        if quota.tokens > 0:
+            quota.tokens -= 1
+            return 1, quota.tokens + quota.remaining, 0, reset_ms
+        
+        return 0, 0, reset_ms, reset_ms
+    
+# Запасной лимитер на случай, когда Redis недоступен: фиксированное окно в памяти воркера.
+# Лимит считается на каждый воркер отдельно, так что общий выходит limit * воркеры -
+# грубее, чем в Redis, но лучше, чем совсем без лимита или 500 на каждый запрос.
+
+class LocalLimiter:
+    def __init__(self, max_keys: int = 100_000):
+        self._windows = TTLCache(maxsize=max_keys, ttl=60)
+        
+    def check(self, key: str, limit: int, period_ms: int) -> tuple[int, int, int, int]:
+        window = self._windows.get(key)
+        
+        if window is None:
+            window = LocalQuota(tokens=limit, remaining=0, expires_at=time.monotonic() + period_ms / 1000)
+            self._windows.set(key, window, ttl=period_ms / 1000)
+            
+        reset_ms = max(0, int((window.expires_at - time.monotonic()) * 1000))
+        
+        if window.tokens > 0:
+            window.tokens -= 1
+            return 1, window.tokens, 0, reset_ms
+        
+        return 0, 0, reset_ms, reset_ms
+    
+_local_limiter = LocalLimiter()
+
+_hybrid_limiters: dict[int, HybridLimiter] = {}
+
+def get_hybrid_limiter(batch: int) -> HybridLimiter:
+    if batch not in _hybrid_limiters:
+        _hybrid_limiters[batch] = HybridLimiter(batch=batch, workers=settings_cache.RATE_LIMIT_WORKERS)
+    return _hybrid_limiters[batch]
+
+def rate_limit_headers(limit: int, remaining: int, reset_ms: int) -> dict[str, str]:
+    return {
+        'RateLimit-Limit': str(limit),
+        'RateLimit-Remaining': str(max(remaining, 0)),
+        'RateLimit-Reset': str(math.ceil(reset_ms / 1000))
+    }
+
+# Эндпоинту не обязательно объявлять Request и Response: если их нет в сигнатуре,
+# обёртка добавляет их сама (FastAPI подставит) и убирает перед вызовом функции.
+
+def rate_limit(limit: int, period: int, algorithm: str = 'sliding_window', batch: int = 10):
+    if algorithm not in RATE_LIMIT_ALGORITHMS and algorithm != 'hybrid':
+        raise ValueError(f'Неизвестный алгоритм лимитера: {algorithm}')
+    if algorithm == 'hybrid' and batch > limit:
+        raise ValueError(f'Пачка гибридного лимитера ({batch}) больше лимита ({limit})')
+    
     def decorator(func):
+        signature = inspect.signature(func)
+        params = list(signature.parameters.values())
+        request_param = next((p.name for p in params if p.annotation is Request), None)
+        response_param = next((p.name for p in params if p.annotation is Response), None)
+        hidden_params = []
+        
+        if request_param is None:
+            request_param = 'rate_limit_request'
+            hidden_params.append(inspect.Parameter(request_param, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+        if response_param is None:
+            response_param = 'rate_limit_response'
+            hidden_params.append(inspect.Parameter(response_param, inspect.Parameter.KEYWORD_ONLY, annotation=Response))
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            request: Request = kwargs.get('request')
-            print(f"DEBUG: Request object: {request}")
+            request: Request = kwargs.get(request_param)
+            response: Response = kwargs.get(response_param)
+            
+            for param in hidden_params:
+                kwargs.pop(param.name, None)
             
             if not request:
                 return await func(*args, **kwargs)
             
-            user_ip = request.client.host
-            
-            key = f'rate_limit:{func.__name__}:{user_ip}'
-            
-            current_count = await client.incr(key)
-            print(f"DEBUG: Ключ: {key}, Текущий счетчик: {current_count}")
+            key = f'rate_limit:{func.__name__}:{request.client.host}'
             
-            if current_count == 1:
-                await client.expire(key, period)
+            try:
+                if algorithm == 'hybrid':
+                    allowed, remaining, retry_after_ms, reset_ms = await get_hybrid_limiter(batch).check(key, limit, period * 1000)
+                else:
+                    allowed, remaining, retry_after_ms, reset_ms = await cache_backend.rate_limit(
+                        algorithm, key, limit, period * 1000, secrets.token_hex(4)
+                    )
+            except Exception as e:
+                log_redis_error('RATE LIMIT', e)
+                metrics.inc('rate_limit.local_fallback')
+                allowed, remaining, retry_after_ms, reset_ms = _local_limiter.check(key, limit, period * 1000)
+            headers = rate_limit_headers(limit, remaining, reset_ms)
                 
-            if current_count > limit:
+            if not allowed:
+                retry_after = math.ceil(retry_after_ms / 1000)
                 raise HTTPException(
                     status_code= status.HTTP_429_TOO_MANY_REQUESTS,
                     detail= {
                         'error': 'Слишком много запросов!',
-                        'retry_after': f'Попробуйте снова через: {await client.ttl(key)}c.'
-                    }
+                        'retry_after': f'Попробуйте снова через: {retry_after}c.'
+                    },
+                    headers={**headers, 'Retry-After': str(retry_after)}
                 )
             
-            return await func(*args, **kwargs)
+            result = await func(*args, **kwargs)
+            
+            # Готовый Response FastAPI отдаёт как есть, поэтому заголовки ставим прямо на него
+            target = result if isinstance(result, Response) else response
+            if target is not None:
+                target.headers.update(headers)
+            
+            return result
+        
+        wrapper.__signature__ = signature.replace(parameters=[
+            *(p for p in params if p.kind != inspect.Parameter.VAR_KEYWORD),
+            *hidden_params,
+            *(p for p in params if p.kind == inspect.Parameter.VAR_KEYWORD)
+        ])
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+# Кеш полной записи текущего юзера (get_current_user).
+# Сначала локальный LRU воркера, потом Redis, и только потом база.
+# Локальная копия живёт несколько секунд, поэтому другие воркеры увидят инвалидацию не позже её TTL.
+
+class PrincipalCache:
+    _local = TTLCache(maxsize=settings_cache.PRINCIPAL_LOCAL_SIZE, ttl=settings_cache.PRINCIPAL_LOCAL_TTL)
+    
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f'principal:{user_id}'
+    
+    @classmethod
+    async def get(cls, user_id: int) -> SUserRead | None:
+        user = cls._local.get(user_id)
+        
+        if user is not None:
+            metrics.inc('principal_cache.local_hits')
+            return user
+        
+        try:
+            user_json = await cache_backend.get(cls._key(user_id))
+        except Exception as e:
+            log_redis_error('GET', e)
+            user_json = None
+            
+        if user_json is not None:
+            user = SUserRead.model_validate_json(user_json)
+            cls._local.set(user_id, user)
+            metrics.inc('principal_cache.redis_hits')
+            return user
+        
+        metrics.inc('principal_cache.misses')
+        return None
+    
+    @classmethod
+    async def set(cls, user: SUserRead):
+        cls._local.set(user.id, user)
+        
+        try:
+            await cache_backend.set(cls._key(user.id), user.model_dump_json(), ttl=settings_cache.PRINCIPAL_TTL)
+        except Exception as e:
+            log_redis_error('SET', e)
+            
+    @classmethod
+    async def invalidate(cls, user_id: int):
+        cls._local.pop(user_id)
+        metrics.inc('principal_cache.invalidations')
+        
+        try:
+            await cache_backend.delete(cls._key(user_id))
+        except Exception as e:
+            log_redis_error('DELETE', e)
+